@@ -1,7 +1,58 @@
+import sys
+
+
 class ASTNode:
+    # Leaves (SYMBOL, CLASS, EPSILON) keep their symbol or symbol set in value. Operators keep their
+    # operands in left and right; STAR has a single operand, stored in left.
+    __slots__ = ('type', 'value', 'left', 'right', 'position', 'nullable', 'firstpos', 'lastpos')
+
     def __init__(self, type, value=None, left=None, right=None):
+        if type == 'STAR' and left is None:
+            # ASTNode('STAR', value=child) is accepted as well
+            left, value = value, None
         self.type = type
-        self.value = value
+        # Symbols are interned, so equal leaf values share one string and compare by identity first
+        self.value = sys.intern(value) if isinstance(value, str) else value
         self.left = left
         self.right = right
         self.position = None
+        # Filled in by DFAConstructor.annotate
+        self.nullable = None
+        self.firstpos = None
+        self.lastpos = None
+
+
+def preorder(root):
+    # Yield (node, depth) for every node, parents before children and left before right, without recursion
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node is None:
+            continue
+        yield node, depth
+        stack.append((node.right, depth + 1))
+        stack.append((node.left, depth + 1))
+
+
+def postorder(root):
+    # Yield every node after its children, left subtree before right subtree, without recursion.
+    # Leaves therefore come out in left-to-right order.
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node is None:
+            continue
+        if expanded:
+            yield node
+        else:
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+
+
+def leaves(root):
+    # Yield the leaves that receive positions (SYMBOL and CLASS), left to right
+    for node in postorder(root):
+        if node.type == 'SYMBOL' or node.type == 'CLASS':
+            yield node
+
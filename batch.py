@@ -0,0 +1,141 @@
+import argparse
+import json
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from compiler import compile
+from lexer import LexerError
+from parse import ParserError
+
+
+class CompileTimeout(Exception):
+    pass
+
+
+def parse_entry(line, line_number):
+    # Parse one input line: a JSON object {"regex": ..., "alphabet": [...], "id": ...} or
+    # "regex<TAB>symbol symbol ...". Returns None for blank lines and '#' comments.
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        data = json.loads(line)
+        return {'id': data.get('id', line_number), 'regex': data['regex'], 'alphabet': list(data['alphabet'])}
+    regex, _, symbols = line.partition('\t')
+    return {'id': line_number, 'regex': regex, 'alphabet': symbols.split()}
+
+
+def read_entries(file):
+    # Read (regex, alphabet) entries from a text file object, one per line
+    # Lines that cannot be parsed become entries carrying an error, so one bad line does not stop the batch
+    for line_number, line in enumerate(file, 1):
+        try:
+            entry = parse_entry(line, line_number)
+        except (ValueError, KeyError, TypeError) as e:
+            entry = {'id': line_number, 'regex': line.strip(), 'alphabet': [],
+                     'error': {'type': 'InputError', 'message': f"Invalid entry: {e}", 'position': None}}
+        if entry is not None:
+            yield entry
+
+
+def raise_timeout(signum, frame):
+    raise CompileTimeout()
+
+
+def compile_entry(entry, minimize=False, timeout=None):
+    # Compile one entry into a JSON-ready result; errors are reported in the result instead of raised.
+    # The timeout uses SIGALRM, so it only applies on platforms that have it and in the main thread.
+    result = {'id': entry['id'], 'regex': entry['regex']}
+    if 'error' in entry:
+        result['error'] = entry['error']
+        return result
+    use_alarm = timeout is not None and hasattr(signal, 'setitimer')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result['dfa'] = compile(entry['regex'], set(entry['alphabet']), minimize).dfa.to_dict()
+    except (LexerError, ParserError) as e:
+        result['error'] = {'type': type(e).__name__, 'message': e.message, 'position': e.position}
+    except CompileTimeout:
+        result['error'] = {'type': 'Timeout', 'message': f"Compilation took longer than {timeout}s", 'position': None}
+    except Exception as e:
+        result['error'] = {'type': type(e).__name__, 'message': str(e), 'position': None}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return result
+
+
+def compile_chunk(entries, minimize=False, timeout=None):
+    # Worker task: compile a chunk of entries
+    return [compile_entry(entry, minimize, timeout) for entry in entries]
+
+
+def chunked(entries, chunk_size):
+    # Group an iterable of entries into lists of at most chunk_size
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def compile_batch(entries, workers=None, chunk_size=16, timeout=None, minimize=False):
+    # Compile entries in parallel across a process pool and yield the results in input order.
+    # A failing pattern only produces an error result; a crashed worker marks its chunk as failed.
+    # With workers=1 everything runs in the current process.
+    if workers == 1:
+        for chunk in chunked(entries, chunk_size):
+            yield from compile_chunk(chunk, minimize, timeout)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = list(chunked(entries, chunk_size))
+        futures = [executor.submit(compile_chunk, chunk, minimize, timeout) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                yield from future.result()
+            except BrokenProcessPool as e:
+                for entry in chunk:
+                    yield {'id': entry['id'], 'regex': entry['regex'],
+                           'error': {'type': 'WorkerError', 'message': str(e), 'position': None}}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compile a file of regexes into serialized DFAs.")
+    arg_parser.add_argument('input', help="JSON Lines file of {regex, alphabet} objects, or regex<TAB>symbols lines ('-' for stdin)")
+    arg_parser.add_argument('-o', '--output', default='-', help="JSON Lines output file ('-' for stdout)")
+    arg_parser.add_argument('-j', '--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    arg_parser.add_argument('--chunk-size', type=int, default=16, help="entries sent to a worker at a time")
+    arg_parser.add_argument('--timeout', type=float, default=None, help="per-pattern time limit in seconds")
+    arg_parser.add_argument('--minimize', action='store_true', help="minimize every DFA")
+    args = arg_parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    failures = 0
+    try:
+        entries = list(read_entries(source))
+        for result in compile_batch(entries, args.workers, args.chunk_size, args.timeout, args.minimize):
+            failures += 'error' in result
+            target.write(json.dumps(result) + '\n')
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    print(f"Compiled {len(entries) - failures} of {len(entries)} patterns", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    err_code = main()
+    sys.exit(err_code)
@@ -0,0 +1,220 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+from dfa import DFAConstructor
+from lexer import Lexer
+from parse import Parser
+
+
+STAGES = ['process_regex', 'parse', 'assign_positions', 'followpos', 'construct_dfa', 'match', 'codegen_match']
+
+
+def length_workload(k):
+    # Regex length: k concatenated groups
+    return f'length-{k}', '(a+b)c' * k, {'a', 'b', 'c'}
+
+
+def depth_workload(d):
+    # Nesting depth: d nested starred groups
+    return f'depth-{d}', '(' * d + 'a+b' + ')*c' * d, {'a', 'b', 'c'}
+
+
+def bounds_workload(m):
+    # Counted repetition with a growing upper bound
+    return f'bounds-{m}', f'(a+b){{1,{m}}}c', {'a', 'b', 'c'}
+
+
+def alphabet_workload(n):
+    # Alphabet size: a union over n multi-character symbols
+    symbols = [f'x{i}' for i in range(n)]
+    return f'alphabet-{n}', '(' + '+'.join(symbols) + ')*x0', set(symbols)
+
+
+def symbol_length_workload(length):
+    # Symbol length: long literal runs over two symbols of the given length
+    a, b = 'a' * length, 'b' * length
+    return f'symbol-length-{length}', '(' + (a + b) * 20 + ')*', {a, b}
+
+
+def workloads(quick=False):
+    # The generated workloads, sweeping one dimension at a time
+    sizes = [1, 4] if quick else [1, 4, 16, 64]
+    result = [length_workload(4 * size) for size in sizes]
+    result += [depth_workload(size) for size in sizes]
+    result += [bounds_workload(4 * size) for size in sizes]
+    result += [alphabet_workload(4 * size) for size in sizes]
+    result += [symbol_length_workload(size) for size in sizes]
+    return result
+
+
+def match_input(dfa, length=1000):
+    # A deterministic accepted input of at most length symbols for the matching stage, so matching runs
+    # over the whole input instead of stopping in the dead state. The walk cycles through the symbols
+    # leading to live states, keeping only those from which an accepting state is still reachable
+    # in the remaining steps and, among them, preferring those that can use up the whole length.
+    symbols = sorted(dfa.symbol_index)
+    dead = dfa.dead
+    successors = [[] for _ in range(dfa.num_states)]  # State -> [(symbol, target)] over live targets
+    for state in range(dfa.num_states):
+        if state == dead:
+            continue
+        for symbol in symbols:
+            target = dfa.target(state, dfa.symbol_index[symbol])
+            if target is not None and target != dead:
+                successors[state].append((symbol, target))
+    predecessors = [[] for _ in range(dfa.num_states)]
+    for state, edges in enumerate(successors):
+        for _, target in edges:
+            predecessors[target].append(state)
+
+    # Shortest distance from every state to an accepting state (backward breadth-first search)
+    distance = [None] * dfa.num_states
+    queue = deque(state for state in dfa.tags)
+    for state in queue:
+        distance[state] = 0
+    while queue:
+        state = queue.popleft()
+        for previous in predecessors[state]:
+            if distance[previous] is None:
+                distance[previous] = distance[state] + 1
+                queue.append(previous)
+
+    # Longest accepted suffix from every state: peel off states without remaining live successors;
+    # the states left over can reach a cycle, so their suffixes are unbounded
+    longest = [length] * dfa.num_states
+    pending = [len(edges) for edges in successors]
+    done = deque(state for state in range(dfa.num_states) if not pending[state] and state != dead)
+    while done:
+        state = done.popleft()
+        options = [longest[target] + 1 for _, target in successors[state]]
+        if state in dfa.tags:
+            options.append(0)
+        longest[state] = max(options)
+        for previous in predecessors[state]:
+            pending[previous] -= 1
+            if not pending[previous]:
+                done.append(previous)
+
+    seq = []
+    state = dfa.start
+    if state == dead or distance[state] is None or distance[state] > length:
+        return seq
+    for i in range(length):
+        remaining = length - i - 1
+        candidates = [(symbol, target) for symbol, target in successors[state]
+                      if distance[target] is not None and distance[target] <= remaining]
+        if not candidates:
+            break
+        preferred = [edge for edge in candidates if longest[edge[1]] >= remaining]
+        if not preferred:
+            best = max(longest[target] for _, target in candidates)
+            preferred = [edge for edge in candidates if longest[edge[1]] == best]
+        symbol, state = preferred[(i * 7) % len(preferred)]
+        seq.append(symbol)
+    return seq
+
+
+def measure(func, min_time):
+    # Call func repeatedly for at least min_time seconds and return calls per second
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time or calls == 0:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def run_workload(name, regex, alphabet, min_time=0.2):
+    # Time every pipeline stage of one workload separately and collect its size metrics
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+    seq = match_input(dfa)
+    generated = {}  # Namespace of the specialized matcher module generated from the DFA
+    exec(dfa.to_python_source(), generated)
+
+    ops = {
+        'process_regex': measure(lambda: lexer.process_regex(regex), min_time),
+        'parse': measure(lambda: Parser(lexer).parse(), min_time),
+        'assign_positions': measure(lambda: dfa_constructor.parser.assign_positions(dfa_constructor.ast), min_time),
+        'followpos': measure(lambda: dfa_constructor.followpos(dfa_constructor.ast), min_time),
+        'construct_dfa': measure(lambda: dfa_constructor.construct_dfa(dfa_constructor.ast), min_time),
+        'match': measure(lambda: dfa.fullmatch(seq), min_time),
+        'codegen_match': measure(lambda: generated['fullmatch'](seq), min_time),
+    }
+
+    # Peak memory of one full compile from scratch
+    tracemalloc.start()
+    constructor = DFAConstructor(Lexer(regex, alphabet))
+    constructor.construct_dfa(constructor.ast)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'ops': ops,
+        'peak_memory': peak,
+        'positions': len(dfa_constructor.followpos_table),
+        'states': dfa.num_states,
+    }
+
+
+def compare(results, baseline, threshold):
+    # Return a message for every stage whose ops/s fell more than threshold below the baseline
+    previous = {entry['name']: entry for entry in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(result['name'])
+        if old is None:
+            continue
+        for stage, value in result['ops'].items():
+            old_value = old['ops'].get(stage)
+            if old_value and value < old_value * (1 - threshold):
+                regressions.append(f"{result['name']} {stage}: {value:.1f} ops/s vs baseline {old_value:.1f} ops/s")
+    return regressions
+
+
+def format_results(results):
+    # Render the results as a fixed-width table
+    header = f"{'workload':<20}" + ''.join(f"{stage:>18}" for stage in STAGES) + f"{'peak KiB':>10}{'positions':>10}{'states':>8}"
+    lines = [header, '-' * len(header)]
+    for result in results:
+        lines.append(f"{result['name']:<20}" + ''.join(f"{result['ops'][stage]:>18.1f}" for stage in STAGES)
+                     + f"{result['peak_memory'] / 1024:>10.1f}{result['positions']:>10}{result['states']:>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark every stage of the regex -> DFA pipeline (ops/s).")
+    arg_parser.add_argument('--quick', action='store_true', help="run the smaller sweep")
+    arg_parser.add_argument('--min-time', type=float, default=0.2, help="seconds spent timing each stage")
+    arg_parser.add_argument('--baseline', help="JSON file with stored results to compare against")
+    arg_parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown against the baseline (fraction)")
+    arg_parser.add_argument('--save', help="write the results to this JSON file")
+    args = arg_parser.parse_args(argv)
+
+    results = [run_workload(name, regex, alphabet, args.min_time) for name, regex, alphabet in workloads(args.quick)]
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    err_code = main()
+    sys.exit(err_code)
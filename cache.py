@@ -0,0 +1,105 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+from compiler import compile
+
+
+def cache_key(regex, alphabet, minimize=False):
+    # Canonical key for a (regex, alphabet) pair: the regex text and the sorted alphabet.
+    # '$' is dropped because the lexer always adds it, so {'a'} and {'a', '$'} share a key.
+    digest = hashlib.sha256()
+    for part in [regex, *sorted(set(alphabet) - {'$'})]:
+        data = part.encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'little'))  # Length prefix keeps the encoding unambiguous
+        digest.update(data)
+    digest.update(b'\x01' if minimize else b'\x00')
+    return digest.hexdigest()
+
+
+def estimate_size(compiled):
+    # Approximate number of bytes held by a compiled regex's DFA and followpos table
+    size = compiled.dfa.memory_size()
+    size += sys.getsizeof(compiled.followpos_table)
+    for follows in compiled.followpos_table.values():
+        size += sys.getsizeof(follows)
+    return size
+
+
+class RegexCache:
+    def __init__(self, max_entries=256, max_memory=None):
+        # LRU cache of compiled regexes bounded by entry count and, optionally, by estimated bytes.
+        # All access goes through one lock, so a cache can be shared between threads.
+        if max_entries < 1:
+            raise ValueError("max_entries must be a positive integer")
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.entries = OrderedDict()  # Key -> (compiled regex, estimated size), least recently used first
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+
+    def get(self, regex, alphabet, minimize=False):
+        # Return the cached compiled regex, compiling and caching it on a miss.
+        # Compilation runs outside the lock; if two threads miss on the same key, the first result stored wins.
+        key = cache_key(regex, alphabet, minimize)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        compiled = compile(regex, alphabet, minimize)
+        size = estimate_size(compiled)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0]
+            self.entries[key] = (compiled, size)
+            self.memory += size
+            self.evict()
+        return compiled
+
+
+    def evict(self):
+        # Drop least recently used entries until the cache fits its limits (caller holds the lock)
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or
+                                         (self.max_memory is not None and self.memory > self.max_memory)):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.memory -= size
+            self.evictions += 1
+
+
+    def stats(self):
+        # Return the cache counters and current size
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'memory': self.memory,
+            }
+
+
+    def clear(self):
+        # Remove every entry and reset the counters
+        with self.lock:
+            self.entries.clear()
+            self.memory = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+default_cache = RegexCache()
+
+
+def cached_compile(regex, alphabet, minimize=False):
+    # compile() through the process-wide cache
+    return default_cache.get(regex, alphabet, minimize)
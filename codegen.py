@@ -0,0 +1,121 @@
+import importlib.util
+import os
+
+
+HEADER = "# Generated by DFA.to_python_source; do not edit.\n"
+
+
+def python_source(dfa, max_branches=8):
+    # Emit a standalone module with fullmatch(seq) and match_prefix(seq) specialized to the DFA
+    # (O(|states| * |symbols|) time complexity). Every symbol class gets a tuple T{c} holding the next
+    # state of every state, so a step is one symbol test and one tuple index whatever the number of
+    # states. Symbols are tested inline against literals (or frozensets for classes with several
+    # symbols) when there are at most max_branches classes, and looked up in a dict otherwise.
+    # Transitions into the dead state, missing transitions and symbols outside the alphabet are -1
+    # or fail the symbol test, and leave the loop inline.
+    width = dfa.num_classes
+    dead = dfa.dead
+    members = [[] for _ in range(width)]
+    for symbol in dfa.alphabet:
+        members[dfa.symbol_index[symbol]].append(symbol)
+
+    # Collect the live states reachable from the start state, in breadth-first order
+    states = [] if dfa.start == dead else [dfa.start]
+    seen = set(states)
+    for state in states:
+        for c in range(width):
+            target = dfa.target(state, c)
+            if target is not None and target != dead and target not in seen:
+                seen.add(target)
+                states.append(target)
+
+    # Columns of the classes that lead somewhere from at least one live state
+    columns = []
+    for c in range(width):
+        column = [-1] * dfa.num_states
+        for state in states:
+            target = dfa.target(state, c)
+            if target is not None and target != dead:
+                column[state] = target
+        if members[c] and any(target >= 0 for target in column):
+            columns.append((c, sorted(members[c]), column))
+    # Whether some live state has a transition into the dead state (or none at all) on a column
+    partial = any(column[state] < 0 for _, _, column in columns for state in states)
+
+    accept = sorted(state for state in dfa.tags if state in seen)
+    lines = [HEADER]
+    lines.append(f"START = {dfa.start if dfa.start != dead else None!r}")
+    lines.append(f"ACCEPT = frozenset({accept!r})")
+    lines.append(f"TAGS = {dict(sorted((state, dfa.tags[state]) for state in accept))!r}")
+    lines.append("")
+    for c, symbols, column in columns:
+        lines.append(f"T{c} = {tuple(column)!r}")
+    inline = len(columns) <= max_branches
+    if inline:
+        for c, symbols, column in columns:
+            if len(symbols) > 1:
+                lines.append(f"C{c} = frozenset({symbols!r})")
+    else:
+        table = {symbol: f"T{c}" for c, symbols, column in columns for symbol in symbols}
+        lines.append("COLUMNS = {" + ", ".join(f"{symbol!r}: {name}" for symbol, name in sorted(table.items())) + "}")
+    lines.extend(["", ""])
+
+    def body(on_dead, accepting_step):
+        # Loop body shared by both matchers; accepting_step is emitted after every live step
+        if not columns:
+            return [f"        {on_dead}"]
+        code = []
+        if inline:
+            for i, (c, symbols, column) in enumerate(columns):
+                test = f"symbol == {symbols[0]!r}" if len(symbols) == 1 else f"symbol in C{c}"
+                code.append(f"        {'if' if i == 0 else 'elif'} {test}:")
+                code.append(f"            state = T{c}[state]")
+            code.append("        else:")
+            code.append(f"            {on_dead}")
+        else:
+            code.append("        column = COLUMNS.get(symbol)")
+            code.append("        if column is None:")
+            code.append(f"            {on_dead}")
+            code.append("        state = column[state]")
+        if partial:
+            code.append("        if state < 0:")
+            code.append(f"            {on_dead}")
+        if accepting_step and accept:
+            code.append("        if state in ACCEPT:")
+            code.append(f"            {accepting_step}")
+        return code
+
+    lines.append("def fullmatch(seq):")
+    lines.append("    # Check whether the whole sequence of symbols is accepted")
+    lines.append("    state = START")
+    lines.append("    for symbol in seq:")
+    lines.extend(body("return False", None))
+    lines.append("    return state in ACCEPT")
+    lines.append("")
+    lines.append("")
+
+    lines.append("def match_prefix(seq):")
+    lines.append("    # Return the length of the longest accepted prefix of the sequence, or None if no prefix is accepted")
+    lines.append("    state = START")
+    lines.append("    longest = 0 if state in ACCEPT else None")
+    lines.append("    for length, symbol in enumerate(seq, 1):")
+    lines.extend(body("break", "longest = length"))
+    lines.append("    return longest")
+    return '\n'.join(lines) + '\n'
+
+
+def write_module(dfa, path, max_branches=8):
+    # Write the generated matcher module for the DFA to path
+    source = python_source(dfa, max_branches)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(source)
+    return path
+
+
+def load_module(path, name=None):
+    # Import a generated matcher module from path without touching sys.path
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,98 @@
+from functools import cached_property
+
+from dfa import DFAConstructor
+from glushkov import GlushkovMatcher, select_engine
+from instrument import CompileStats
+from lexer import Lexer
+
+
+class CompiledRegex:
+    def __init__(self, regex, alphabet, minimize=False, tracer=None, engine='dfa', max_dfa_states=4096):
+        # Hold every artifact of the regex -> DFA pipeline. Each stage runs at most once,
+        # the first time it (or a later stage) is needed, and its result is kept on the object.
+        # Phase timings are collected in a CompileStats record and forwarded to the optional tracer.
+        # engine selects the matcher: 'dfa', 'glushkov' (bit-parallel position automaton, no DFA is
+        # built) or 'auto' (the DFA unless it would have more than max_dfa_states states).
+        if engine not in {'dfa', 'glushkov', 'auto'}:
+            raise ValueError(f"Unknown engine: {engine}")
+        self.regex = regex
+        self.alphabet = frozenset(alphabet)
+        self.minimize = minimize
+        self.tracer = CompileStats(tracer)
+        self.engine = engine
+        self.max_dfa_states = max_dfa_states
+
+
+    @cached_property
+    def lexer(self):
+        # Lexing stage: the processed regex with explicit concatenation operators
+        return Lexer(self.regex, set(self.alphabet), tracer=self.tracer)
+
+
+    @cached_property
+    def constructor(self):
+        # Parsing, position assignment and followpos stages
+        return DFAConstructor(self.lexer)
+
+
+    @property
+    def parser(self):
+        return self.constructor.parser
+
+
+    @property
+    def ast(self):
+        return self.constructor.ast
+
+
+    @property
+    def followpos_table(self):
+        return self.constructor.followpos_table
+
+
+    @cached_property
+    def dfa(self):
+        # Subset construction stage
+        return self.constructor.construct_dfa(self.constructor.ast, minimize=self.minimize)
+
+
+    @cached_property
+    def matcher(self):
+        # The engine used by fullmatch and match_prefix
+        if self.engine == 'dfa':
+            return self.dfa
+        if self.engine == 'glushkov':
+            return GlushkovMatcher(self.constructor)
+        matcher = select_engine(self.constructor, self.max_dfa_states, self.minimize)
+        if not isinstance(matcher, GlushkovMatcher):
+            self.dfa = matcher  # Keep the DFA built by the probe
+        return matcher
+
+
+    @cached_property
+    def stats(self):
+        # Per-phase wall times and artifact sizes. Uses the DFA of the selected engine; when that is
+        # a GlushkovMatcher no DFA is built and the DFA counts are left as None.
+        matcher = self.matcher
+        dfa = None if isinstance(matcher, GlushkovMatcher) else matcher
+        self.tracer.record_counts(self.lexer, self.ast, self.followpos_table, dfa,
+                                  self.constructor.positions_removed)
+        return self.tracer
+
+
+    def fullmatch(self, seq):
+        # Check whether the whole sequence of symbols is accepted
+        return self.matcher.fullmatch(seq)
+
+
+    def match_prefix(self, seq):
+        # Return the length of the longest accepted prefix of the sequence, or None
+        return self.matcher.match_prefix(seq)
+
+
+def compile(regex, alphabet, minimize=False, tracer=None, engine='dfa', max_dfa_states=4096):
+    # Run the whole pipeline once and return the result with every stage's artifact attached.
+    # Raises LexerError or ParserError for invalid regexes.
+    compiled = CompiledRegex(regex, alphabet, minimize, tracer, engine, max_dfa_states)
+    compiled.matcher
+    return compiled
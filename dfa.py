@@ -1,191 +1,904 @@
+import logging
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Mapping
+
+from astnode import leaves, postorder
+from codegen import python_source, write_module
+from instrument import phase
 from parse import Parser
+from simplify import simplify_ast
+
+logger = logging.getLogger(__name__)
+
+
+def int_typecode(limit):
+    # Smallest unsigned array typecode that can hold values below limit
+    return 'B' if limit <= 1 << 8 else 'H' if limit <= 1 << 16 else 'I' if limit <= 1 << 32 else 'Q'
+
+
+class CompiledDFA:
+    def __init__(self, dfa):
+        # Lay the DFA out as a dense integer table (O(|states| * |symbols|) time complexity).
+        # States are numbered in breadth-first order from the start state, which gets 0.
+        # Table entries hold the row offset (state * number of symbols) of the target state,
+        # so one step is a single index into the table.
+        # Columns are the DFA's symbol classes; symbol_index maps each symbol to its column
+        self.symbols = list(dfa.alphabet)
+        self.symbol_index = dict(dfa.symbol_index)
+        width = dfa.num_classes
+        self.width = max(width, 1)
+
+        states = [dfa.start]
+        state_index = {dfa.start: 0}
+        for state in states:
+            for c in range(width):
+                next_state = dfa.target(state, c)
+                if next_state is not None and next_state not in state_index:
+                    state_index[next_state] = len(states)
+                    states.append(next_state)
+
+        # Missing transitions go to an extra dead state appended after the real ones
+        missing = len(states)
+        rows = []
+        for state in states:
+            targets = (dfa.target(state, c) for c in range(width))
+            rows.append([missing if target is None else state_index[target] for target in targets])
+        if any(missing in row for row in rows):
+            rows.append([missing] * width)
+        self.num_states = len(rows)
+
+        self.table = array(int_typecode(self.num_states * self.width),
+                           [target * self.width for row in rows for target in row])
+
+        # Accept bitmap: bit (s & 7) of byte (s >> 3) is set when state s is accepting
+        accept = bytearray((self.num_states + 7) >> 3)
+        self.accept_tags = [None] * self.num_states  # Tag of the pattern each state accepts, or None
+        for state, tag in dfa.tags.items():
+            if state in state_index:
+                s = state_index[state]
+                accept[s >> 3] |= 1 << (s & 7)
+                self.accept_tags[s] = tag
+        self.accept = bytes(accept)
+
+        # The dead state is a rejecting state whose transitions all loop back to itself
+        self.dead = -1
+        for s, row in enumerate(rows):
+            if not self.is_accepting(s) and all(target == s for target in row):
+                self.dead = s * self.width
+                break
+
+
+    def is_accepting(self, state):
+        # Check the accept bitmap for the given state number
+        return (self.accept[state >> 3] >> (state & 7)) & 1 == 1
+
+
+    def fullmatch(self, seq):
+        # Check whether the whole sequence of symbols is accepted (O(len(seq)) time complexity).
+        # Symbols outside the alphabet reject immediately, as does entering the dead state.
+        table = self.table
+        symbol_index = self.symbol_index
+        dead = self.dead
+        offset = 0
+        for symbol in seq:
+            index = symbol_index.get(symbol)
+            if index is None:
+                return False
+            offset = table[offset + index]
+            if offset == dead:
+                return False
+        return self.is_accepting(offset // self.width)
+
+
+    def match_prefix(self, seq):
+        # Return the length of the longest accepted prefix of the sequence, or None if no prefix is accepted
+        table = self.table
+        symbol_index = self.symbol_index
+        dead = self.dead
+        width = self.width
+        offset = 0
+        longest = 0 if self.is_accepting(0) else None
+        for length, symbol in enumerate(seq, 1):
+            index = symbol_index.get(symbol)
+            if index is None:
+                break
+            offset = table[offset + index]
+            if offset == dead:
+                break
+            if self.is_accepting(offset // width):
+                longest = length
+        return longest
+
+
+class TransitionsView(Mapping):
+    __slots__ = ('dfa',)
+
+    def __init__(self, dfa):
+        # Read-only {state name: {symbol: state name}} view of a DFA's compact transition rows
+        self.dfa = dfa
+
+
+    def __getitem__(self, name):
+        return self.dfa.row_dict(self.dfa.state_id(name))
+
+
+    def __iter__(self):
+        return (self.dfa.state_name(state) for state in range(len(self.dfa.rows)))
+
+
+    def __len__(self):
+        return len(self.dfa.rows)
+
 
 class DFA:
-    def __init__(self, start_state, accept_states, transitions):
-        # Initialize the DFA with the start state, accept states, and transitions
-        self.start_state = start_state
-        self.accept_states = accept_states
-        self.transitions = transitions
+    # States are integers 0..n-1. Symbols that always behave the same share a class, and
+    # symbol_index maps every symbol to its class number. Each row in self.rows is either a dense
+    # array of targets indexed by class, or a sparse (class numbers, targets) pair of sorted arrays;
+    # classes missing from a sparse row lead to self.dead (or nowhere, if the DFA has no dead state).
+    # self.tags maps each accepting state to the id of the pattern it accepts. State names ('q0', ...)
+    # are only stored when they are not simply 'q' followed by the state number.
+    __slots__ = ('alphabet', 'symbol_index', 'num_classes', 'rows', 'start', 'tags', 'dead', 'names',
+                 'name_index', 'compiled')
+
+    def __init__(self, start_state, accept_states, transitions, accept_tags=None):
+        # Initialize the DFA with the start state, accept states, and transitions given as
+        # {state: {symbol: state}} dicts. accept_tags maps each accept state to the id of the pattern
+        # it accepts (lower ids win); a DFA built from a single regex tags every accept state with 0.
+        names = list(transitions)
+        known = set(names)
+        for state in [start_state, *accept_states, *(s for trans in transitions.values() for s in trans.values())]:
+            if state not in known:
+                known.add(state)
+                names.append(state)
+        index = {name: state for state, name in enumerate(names)}
+        alphabet = sorted({symbol for trans in transitions.values() for symbol in trans})
+
+        rows = []
+        for name in names:
+            trans = transitions.get(name, {})
+            rows.append([index[trans[symbol]] if symbol in trans else None for symbol in alphabet])
+        accept_tags = accept_tags or {}
+        tags = {index[state]: accept_tags.get(state, 0) for state in accept_states}
+        self.init_core(alphabet, rows, index[start_state], tags, names)
+
+
+    @classmethod
+    def from_table(cls, alphabet, rows, start, tags, names=None, symbol_index=None):
+        # Build a DFA directly from integer rows: rows[state][c] is the target for class c, or None.
+        # symbol_index maps each symbol to its class; by default every symbol is its own class.
+        dfa = cls.__new__(cls)
+        dfa.init_core(alphabet, rows, start, tags, names, symbol_index)
+        return dfa
+
+
+    def init_core(self, alphabet, rows, start, tags, names, symbol_index=None):
+        # Store the compact representation, choosing dense or sparse storage per row
+        self.alphabet = tuple(alphabet)
+        if symbol_index is None:
+            symbol_index = {symbol: c for c, symbol in enumerate(self.alphabet)}
+        self.symbol_index = dict(symbol_index)
+        self.num_classes = max(self.symbol_index.values(), default=-1) + 1
+        self.start = start
+        self.tags = dict(tags)
+        self.compiled = None
+        if names is not None and all(name == f'q{state}' for state, name in enumerate(names)):
+            names = None
+        self.names = tuple(names) if names is not None else None
+        self.name_index = {name: state for state, name in enumerate(self.names)} if self.names is not None else None
+
+        # The dead state rejects and every transition out of it stays in it (missing ones included)
+        self.dead = None
+        for state, row in enumerate(rows):
+            if state not in self.tags and all(target is None or target == state for target in row):
+                self.dead = state
+                break
+
+        typecode = int_typecode(len(rows))
+        width = self.num_classes
+        symbol_typecode = int_typecode(width)
+        self.rows = []
+        for row in rows:
+            present = [(c, target) for c, target in enumerate(row) if target is not None and target != self.dead]
+            if (self.dead is None and len(present) < width) or 2 * len(present) <= width:
+                self.rows.append((array(symbol_typecode, [c for c, _ in present]),
+                                  array(typecode, [target for _, target in present])))
+            else:
+                self.rows.append(array(typecode, [self.dead if target is None else target for target in row]))
+
+
+    def target(self, state, c):
+        # Return the state reached from state on symbol class c, or None if there is no transition
+        row = self.rows[state]
+        if type(row) is tuple:
+            symbols, targets = row
+            i = bisect_left(symbols, c)
+            if i < len(symbols) and symbols[i] == c:
+                return targets[i]
+            return self.dead
+        return row[c]
+
+
+    def state_name(self, state):
+        # Return the display name of a state number
+        return self.names[state] if self.names is not None else f'q{state}'
+
+
+    def state_id(self, name):
+        # Return the state number of a display name, raising KeyError for unknown names
+        if self.name_index is not None:
+            return self.name_index[name]
+        if isinstance(name, str) and name[:1] == 'q' and name[1:].isdigit() and int(name[1:]) < len(self.rows):
+            return int(name[1:])
+        raise KeyError(name)
+
+
+    def row_dict(self, state):
+        # Return the transitions of one state as {symbol: state name}
+        result = {}
+        for symbol in self.alphabet:
+            target = self.target(state, self.symbol_index[symbol])
+            if target is not None:
+                result[symbol] = self.state_name(target)
+        return result
+
+
+    @property
+    def num_states(self):
+        return len(self.rows)
+
+
+    @property
+    def start_state(self):
+        return self.state_name(self.start)
+
+
+    @property
+    def accept_states(self):
+        return {self.state_name(state) for state in self.tags}
+
+
+    @property
+    def accept_tags(self):
+        return {self.state_name(state): tag for state, tag in self.tags.items()}
+
+
+    @property
+    def transitions(self):
+        # Compatibility view of the rows as {state: {symbol: state}}, built one row at a time on access
+        return TransitionsView(self)
+
+
+    def memory_size(self):
+        # Approximate number of bytes held by the transition rows and state bookkeeping
+        size = sys.getsizeof(self.rows) + sys.getsizeof(self.tags)
+        for row in self.rows:
+            if type(row) is tuple:
+                size += sys.getsizeof(row) + sys.getsizeof(row[0]) + sys.getsizeof(row[1])
+            else:
+                size += sys.getsizeof(row)
+        return size
+
     
     def print_dfa(self):
         # Print the DFA's start state, accept states, and transitions
-        print(f"Start State: {self.start_state}")
-        print(f"Accept States: {self.accept_states}")
-        print("Transitions:")
+        print(self.format_dfa())
+
+
+    def format_dfa(self):
+        # Render the DFA's start state, accept states, and transitions as text
+        lines = [f"Start State: {self.start_state}", f"Accept States: {self.accept_states}", "Transitions:"]
         for state, trans in self.transitions.items():
             for symbol, next_state in trans.items():
-                print(f"  {state} {symbol} {next_state}")
+                lines.append(f"  {state} {symbol} {next_state}")
+        return '\n'.join(lines)
+
+
+    def to_dict(self):
+        # Serialize the DFA into plain JSON-compatible data
+        return {
+            'start_state': self.start_state,
+            'accept_states': sorted(self.accept_states),
+            'accept_tags': dict(sorted(self.accept_tags.items())),
+            'transitions': {state: dict(trans) for state, trans in self.transitions.items()},
+        }
+
+
+    @classmethod
+    def from_dict(cls, data):
+        # Rebuild a DFA serialized with to_dict
+        return cls(data['start_state'], set(data['accept_states']),
+                   {state: dict(trans) for state, trans in data['transitions'].items()},
+                   dict(data.get('accept_tags', {})) or None)
+
+
+    def compile(self):
+        # Build (once) and return the dense integer table used for matching
+        if self.compiled is None:
+            self.compiled = CompiledDFA(self)
+        return self.compiled
+
+
+    def fullmatch(self, seq):
+        # Check whether the whole sequence of symbols is accepted by the DFA
+        return self.compile().fullmatch(seq)
+
+
+    def match_prefix(self, seq):
+        # Return the length of the longest accepted prefix of the sequence, or None
+        return self.compile().match_prefix(seq)
+
+
+    def to_python_source(self, max_branches=8):
+        # Return the source of a standalone module with fullmatch and match_prefix functions
+        # specialized to this DFA (see codegen.python_source)
+        return python_source(self, max_branches)
+
+
+    def write_python_module(self, path, max_branches=8):
+        # Write the specialized matcher module to path; load it with codegen.load_module
+        return write_module(self, path, max_branches)
+
+
+    def symbols(self):
+        # Return the sorted list of symbols used by the transitions
+        return list(self.alphabet)
+
+
+    def minimize(self):
+        # Return an equivalent DFA with the minimum number of states using Hopcroft's
+        # partition refinement (O(n * |symbols| * log n) time complexity).
+        # Unreachable states are dropped, all dead states collapse into a single one and
+        # missing transitions are treated as transitions into that dead state. Symbol classes are kept.
+        width = self.num_classes
+
+        # Collect the states reachable from the start state
+        order = [self.start]
+        index = {self.start: 0}
+        for state in order:
+            for c in range(width):
+                next_state = self.target(state, c)
+                if next_state is not None and next_state not in index:
+                    index[next_state] = len(order)
+                    order.append(next_state)
+
+        # Build an integer transition table, adding an explicit sink for missing transitions
+        sink = len(order)
+        delta = []
+        uses_sink = False
+        for state in order:
+            row = []
+            for c in range(width):
+                next_state = self.target(state, c)
+                if next_state is None:
+                    row.append(sink)
+                    uses_sink = True
+                else:
+                    row.append(index[next_state])
+            delta.append(row)
+        if uses_sink:
+            delta.append([sink] * width)
+        n = len(delta)
+
+        inverse = [[[] for _ in range(n)] for _ in range(width)]
+        for source, row in enumerate(delta):
+            for c, target in enumerate(row):
+                inverse[c][target].append(source)
+
+        # Start from the partition into rejecting states and accepting states grouped by tag
+        tag_of = {index[state]: tag for state, tag in self.tags.items() if state in index}
+        groups = {}
+        for state in range(n):
+            groups.setdefault(tag_of.get(state), set()).add(state)
+        blocks = list(groups.values())
+        block_of = [0] * n
+        for b, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = b
+        # Every initial block except the largest one has to be used as a splitter
+        largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+        worklist = [b for b in range(len(blocks)) if b != largest]
+
+        while worklist:
+            splitter = list(blocks[worklist.pop()])
+            for c in range(width):
+                # Group the predecessors of the splitter by the block they belong to
+                touched = {}
+                for target in splitter:
+                    for source in inverse[c][target]:
+                        touched.setdefault(block_of[source], []).append(source)
+                for b, hit in touched.items():
+                    block = blocks[b]
+                    if len(hit) == len(block):
+                        continue
+                    hit = set(hit)
+                    block.difference_update(hit)
+                    if len(block) < len(hit):
+                        # Keep the larger half in place so only the smaller one is relabelled
+                        blocks[b], hit = hit, block
+                    new_block = len(blocks)
+                    blocks.append(hit)
+                    for state in hit:
+                        block_of[state] = new_block
+                    worklist.append(new_block)
+
+        # Number the blocks in breadth-first order from the start state
+        numbers = {block_of[0]: 0}
+        queue = [block_of[0]]
+        representative = {b: min(block) for b, block in enumerate(blocks)}
+        rows = []
+        for b in queue:
+            row = []
+            for target in delta[representative[b]]:
+                target = block_of[target]
+                if target not in numbers:
+                    numbers[target] = len(numbers)
+                    queue.append(target)
+                row.append(numbers[target])
+            rows.append(row)
+
+        tags = {numbers[block_of[state]]: tag for state, tag in tag_of.items()}
+        return DFA.from_table(self.alphabet, rows, 0, tags, symbol_index=self.symbol_index)
+
+
+    def equivalent(self, other):
+        # Check whether both DFAs accept the same language with Hopcroft and Karp's union-find algorithm
+        # over their product, explored on the fly (O(n * |classes| * α(n)) time complexity, where n is
+        # the total number of states). Symbols missing from one alphabet lead to that DFA's dead state.
+        # Returns (True, None), or (False, counterexample) as soon as a list of symbols accepted by
+        # exactly one of the two DFAs is found.
+        symbols = self.product_symbols(other)
+        parent = {}
+
+        def find(state):
+            # Return the representative of a (side, state) pair, halving the path on the way
+            parent.setdefault(state, state)
+            while parent[state] != state:
+                parent[state] = parent[parent[state]]
+                state = parent[state]
+            return state
+
+        start = (self.start, other.start)
+        parent[find((0, self.start))] = find((1, other.start))
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            pair = queue.popleft()
+            p, q = pair
+            if (p in self.tags) != (q in other.tags):
+                return False, self.product_word(previous, pair)
+            for symbol, c1, c2 in symbols:
+                next_pair = (self.step_or_sink(p, c1), other.step_or_sink(q, c2))
+                a, b = find((0, next_pair[0])), find((1, next_pair[1]))
+                if a != b:
+                    # Unmerged states have not been compared yet; merging them is the induction step
+                    parent[a] = b
+                    previous[next_pair] = (pair, symbol)
+                    queue.append(next_pair)
+        return True, None
+
+
+    def includes(self, other):
+        # Check whether every sequence accepted by other is accepted by this DFA, exploring their
+        # product on the fly in breadth-first order (O(n1 * n2 * |classes|) time complexity at worst).
+        # Inclusion is not preserved by merging states, so visited pairs are tracked instead of a union-find.
+        # Returns (True, None), or (False, counterexample) with a shortest list of symbols that other
+        # accepts and this DFA rejects.
+        symbols = self.product_symbols(other)
+        start = (self.start, other.start)
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            pair = queue.popleft()
+            p, q = pair
+            if q in other.tags and p not in self.tags:
+                return False, self.product_word(previous, pair)
+            if q is None or q == other.dead:
+                # other accepts nothing from here on
+                continue
+            for symbol, c1, c2 in symbols:
+                next_pair = (self.step_or_sink(p, c1), other.step_or_sink(q, c2))
+                if next_pair not in previous:
+                    previous[next_pair] = (pair, symbol)
+                    queue.append(next_pair)
+        return True, None
+
+
+    def product_symbols(self, other):
+        # Return one (symbol, class in self, class in other) triple for each pair of symbol classes that
+        # occurs in the union of both alphabets; the class is None where a DFA lacks the symbol
+        joint = {}
+        for symbol in sorted(set(self.alphabet) | set(other.alphabet)):
+            key = (self.symbol_index.get(symbol), other.symbol_index.get(symbol))
+            if key not in joint:
+                joint[key] = symbol
+        return [(symbol, c1, c2) for (c1, c2), symbol in joint.items()]
+
+
+    def step_or_sink(self, state, c):
+        # Follow symbol class c from state; None stands for the implicit rejecting sink
+        if state is None or c is None:
+            return None
+        return self.target(state, c)
+
+
+    def product_word(self, previous, pair):
+        # Rebuild the symbols leading from the start pair to pair from the breadth-first search links
+        word = []
+        while previous[pair] is not None:
+            pair, symbol = previous[pair]
+            word.append(symbol)
+        word.reverse()
+        return word
 
 
 class DFAConstructor:
-    def __init__(self, lexer):
-        # Initialize the DFAConstructor with a lexer
+    def __init__(self, lexer, ast=None, end_markers=None, simplify=True):
+        # Initialize the DFAConstructor with a lexer: parse the regex, simplify the AST (see
+        # simplify.Simplifier), assign positions and compute the followpos table. The DFA itself
+        # is built by construct_dfa. An already parsed AST can be passed in instead, together with
+        # the end marker symbols it uses mapped to the tag of the pattern each one ends.
         self.parser = Parser(lexer)
-        self.ast = self.parser.parse()
-        self.parser.assign_positions(self.ast)
+        self.tracer = lexer.tracer
+        self.ast = self.parser.parse() if ast is None else ast
+        self.positions_removed = 0  # Positions saved by the simplification pass
+        if simplify:
+            with phase(self.tracer, 'simplify'):
+                self.ast, self.positions_removed = simplify_ast(self.ast)
+            logger.debug("Simplification removed %d positions", self.positions_removed)
+        with phase(self.tracer, 'positions'):
+            self.parser.assign_positions(self.ast)
+        self.end_markers = {'#': 0} if end_markers is None else end_markers
         
-        # Print the AST for debugging
-        self.parser.print_ast(self.ast)
-            
-        # Construct the DFA from the AST
-        followpos_table = self.followpos(self.ast)
-        for pos, follows in followpos_table.items():
-            print(f"Position {pos}: Follow positions -> {follows}")
+        # Log the AST for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("AST:\n%s", self.parser.format_ast(self.ast))
             
-        dfa = self.construct_dfa(self.ast)
-        dfa.print_dfa()
+        self.followpos_table = self.followpos(self.ast)
+        if logger.isEnabledFor(logging.DEBUG):
+            for pos, follows in self.followpos_table.items():
+                logger.debug("Position %s: Follow positions -> %s", pos, follows)
         
         
+    def annotate(self, node):
+        # Compute nullable, firstpos and lastpos for every node in one post-order pass (O(n) time complexity)
+        for node in postorder(node):
+            if node.type == 'SYMBOL' or node.type == 'CLASS':
+                node.nullable = False
+                node.firstpos = node.lastpos = frozenset((node.position,))
+            elif node.type == 'STAR':
+                node.nullable = True
+                node.firstpos = node.left.firstpos
+                node.lastpos = node.left.lastpos
+            elif node.type == 'CONCAT':
+                left, right = node.left, node.right
+                node.nullable = left.nullable and right.nullable
+                node.firstpos = left.firstpos | right.firstpos if left.nullable else left.firstpos
+                node.lastpos = left.lastpos | right.lastpos if right.nullable else right.lastpos
+            elif node.type == 'UNION':
+                left, right = node.left, node.right
+                node.nullable = left.nullable or right.nullable
+                node.firstpos = left.firstpos | right.firstpos
+                node.lastpos = left.lastpos | right.lastpos
+            elif node.type == 'EPSILON':
+                node.nullable = True
+                node.firstpos = node.lastpos = frozenset()
+            else:
+                raise ValueError(f"Unknown node type: {node.type}")
+
+
     def nullable(self, node):
-        # Determine if the given node is nullable (can produce the empty string) (O(n) time complexity) 
-        if node.type == 'SYMBOL': 
-            return False
-        elif node.type == 'STAR':
-            return True
-        elif node.type == 'CONCAT':
-            return self.nullable(node.left) and self.nullable(node.right)
-        elif node.type == 'UNION':
-            return self.nullable(node.left) or self.nullable(node.right)
-        elif node.type == 'EPSILON':
-            return True
-        else:
-            raise ValueError(f"Unknown node type: {node.type}")
+        # Determine if the given node is nullable (can produce the empty string) (O(1) once annotated)
+        if node.nullable is None:
+            self.annotate(node)
+        return node.nullable
     
     
     def firstpos(self, node):
-        # Compute the first positions of the given node (O(n) time complexity)
-        if node.type == 'SYMBOL':
-            return {node.position}
-        elif node.type == 'STAR':
-            return self.firstpos(node.value)
-        elif node.type == 'CONCAT':
-            if self.nullable(node.left):
-                return self.firstpos(node.left) | self.firstpos(node.right)
-            else:
-                return self.firstpos(node.left)
-        elif node.type == 'UNION':
-            return self.firstpos(node.left) | self.firstpos(node.right)
-        elif node.type == 'EPSILON':
-            return set()
-        else:
-            raise ValueError(f"Unknown node type: {node.type}")
+        # Compute the first positions of the given node (O(1) once annotated)
+        if node.firstpos is None:
+            self.annotate(node)
+        return node.firstpos
     
     
     def lastpos(self, node):
-        # Compute the last positions of the given node (O(n) time complexity)
-        if node.type == 'SYMBOL':
-            return {node.position}
-        elif node.type == 'STAR':
-            return self.lastpos(node.value)
-        elif node.type == 'CONCAT':
-            if self.nullable(node.right):
-                return self.lastpos(node.left) | self.lastpos(node.right)
-            else:
-                return self.lastpos(node.right)
-        elif node.type == 'UNION':
-            return self.lastpos(node.left) | self.lastpos(node.right)
-        elif node.type == 'EPSILON':
-            return set()
-        else:
-            raise ValueError(f"Unknown node type: {node.type}")
+        # Compute the last positions of the given node (O(1) once annotated)
+        if node.lastpos is None:
+            self.annotate(node)
+        return node.lastpos
     
     
     def followpos(self, node):
         # Compute the follow positions for each position in the AST (O(n) time complexity)
-        followpos_table = {}
-
-        def init_followpos(node):
-            # Initialize the followpos table
-            if node is None:
-                return
-            if node.type == 'SYMBOL':
-                followpos_table[node.position] = set()
-            init_followpos(node.left)
-            init_followpos(node.right)
-            if node.type == 'STAR':
-                init_followpos(node.value)
-
-        def calculate_followpos(node):
-            # Calculate the follow positions
-            if node is None:
-                return
-            if node.type == 'CONCAT':
-                for pos in self.lastpos(node.left):
-                    followpos_table[pos].update(self.firstpos(node.right))
-            if node.type == 'STAR':
-                for pos in self.lastpos(node.value):
-                    followpos_table[pos].update(self.firstpos(node.value))
-            calculate_followpos(node.left)
-            calculate_followpos(node.right)
-            if node.type == 'STAR':
-                calculate_followpos(node.value)
-
-        init_followpos(node)
-        calculate_followpos(node)
+        with phase(self.tracer, 'followpos'):
+            self.annotate(node)
+            followpos_table = {leaf.position: set() for leaf in leaves(node)}
+            for node in postorder(node):
+                if node.type == 'CONCAT':
+                    firstpos = node.right.firstpos
+                    for pos in node.left.lastpos:
+                        followpos_table[pos].update(firstpos)
+                elif node.type == 'STAR':
+                    firstpos = node.left.firstpos
+                    for pos in node.left.lastpos:
+                        followpos_table[pos].update(firstpos)
         return followpos_table
         
         
     def build_ast_by_position(self, node, ast_by_position):
         # Build a dictionary mapping positions to AST nodes
-        if node is None:
-            return
-        if node.type == 'SYMBOL':
-            ast_by_position[node.position] = node
-        self.build_ast_by_position(node.left, ast_by_position)
-        self.build_ast_by_position(node.right, ast_by_position)
-        if node.type == 'STAR':
-            self.build_ast_by_position(node.value, ast_by_position)
-
-
-    def construct_dfa(self, ast):
-        # Construct the DFA from the AST
-        followpos_table = self.followpos(ast)
-        ast_by_position = {}
-        self.build_ast_by_position(ast, ast_by_position)
-
-        # Get the set of symbols (excluding epsilon)
-        symbols = set(self.parser.lexer.alphabet)
-        symbols.remove('$')
-
-        # Initialize the DFA's states, transitions, and accept states
-        start_state = frozenset(self.firstpos(ast))
-        dfa_states = {start_state}
-        unmarked_states = [start_state]
-        dfa_transitions = {}
-        dfa_accept_states = set()
-
-        while unmarked_states:
-            T = unmarked_states.pop()
-            if T not in dfa_transitions:
-                dfa_transitions[T] = {}
+        for leaf in leaves(node):
+            ast_by_position[leaf.position] = leaf
+
+
+    def construct_dfa(self, ast, bitset=None, minimize=False, max_states=None):
+        # Construct the DFA from the AST, reusing the followpos table computed in __init__.
+        # bitset selects the subset construction: True for bitmasks, False for position sets and
+        # None to let prefer_bitset choose; both give the same DFA.
+        # With minimize=True the result is passed through DFA.minimize before it is returned.
+        # With max_states set, StateLimitError is raised as soon as more states than that are discovered.
+        followpos_table = self.followpos_table if ast is self.ast else self.followpos(ast)
+        with phase(self.tracer, 'subset'):
+            ast_by_position = {}
+            self.build_ast_by_position(ast, ast_by_position)
+
+            # Get the symbols (excluding epsilon) in a fixed order so state numbering is reproducible,
+            # and run the construction once per class of indistinguishable symbols
+            symbols = sorted(set(self.parser.lexer.alphabet) - {'$'})
+            representatives, symbol_index = self.symbol_classes(symbols, ast_by_position)
+
+            if bitset is None:
+                bitset = self.prefer_bitset(ast.firstpos, representatives, followpos_table, ast_by_position)
+            construction = self.subset_construction_bitset if bitset else self.subset_construction
+            rows, tags, states = construction(ast.firstpos, representatives, followpos_table, ast_by_position, max_states)
+            if bitset:
+                hashes = [hash(self.mask_to_positions(mask)) for mask in states]
+            else:
+                hashes = [hash(state) for state in states]
+
+            # Number the states; state i is displayed as 'qi'
+            state_ids = self.state_numbering(rows, hashes)
+            numbered_rows = [None] * len(rows)
+            for state, row in enumerate(rows):
+                row[:] = [state_ids[target] for target in row]
+                numbered_rows[state_ids[state]] = row
+            tags = {state_ids[state]: tag for state, tag in tags.items()}
+            dfa = DFA.from_table(symbols, numbered_rows, state_ids[0], tags, symbol_index=symbol_index)
+        if minimize:
+            with phase(self.tracer, 'minimize'):
+                dfa = dfa.minimize()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("DFA:\n%s", dfa.format_dfa())
+        return dfa
+
+
+    def symbol_classes(self, symbols, ast_by_position):
+        # Partition the symbols into classes the regex cannot tell apart: symbols labelling exactly
+        # the same positions. Every symbol the regex never mentions ends up in one shared class.
+        # Classes are numbered by their smallest symbol, which also represents the class; iterating
+        # the representatives therefore discovers DFA states in the same order as iterating all symbols.
+        positions = {symbol: [] for symbol in symbols}
+        for pos, leaf in sorted(ast_by_position.items()):
+            for symbol in self.leaf_symbols(leaf):
+                if symbol in positions:
+                    positions[symbol].append(pos)
+
+        class_of_signature = {}
+        representatives = []
+        symbol_index = {}
+        for symbol in symbols:
+            signature = tuple(positions[symbol])
+            if signature not in class_of_signature:
+                class_of_signature[signature] = len(representatives)
+                representatives.append(symbol)
+            symbol_index[symbol] = class_of_signature[signature]
+        return representatives, symbol_index
+
+
+    def leaf_symbols(self, leaf):
+        # Return the symbols a positioned leaf matches: its own symbol, or every member of a character class
+        return leaf.value if leaf.type == 'CLASS' else (leaf.value,)
+
+
+    def state_numbering(self, rows, hashes):
+        # Return the final number of every constructed state, given the rows and the hashes of the
+        # position sets of the states in discovery order (the start state first). The numbering is the
+        # one the DFA has always had: states are explored depth-first, following targets in symbol order,
+        # and numbered in the iteration order of a set of their position sets built in that order.
+        # That order only depends on the hashes, so the set holds StateKey objects instead of the sets.
+        seen = [False] * len(rows)
+        seen[0] = True
+        explored = [0]
+        stack = [0]
+        while stack:
+            for target in rows[stack.pop()]:
+                if not seen[target]:
+                    seen[target] = True
+                    explored.append(target)
+                    stack.append(target)
+        keys = {StateKey(state, hashes[state]) for state in explored}
+        state_ids = [None] * len(rows)
+        for index, key in enumerate(keys):
+            state_ids[key.state] = index
+        return state_ids
+
+
+    def subset_construction(self, firstpos, symbols, followpos_table, ast_by_position, max_states=None):
+        # Build the DFA states as sets of positions (O(|states| * |symbols| * |positions|) time complexity).
+        # States are indexed in the order they are discovered and processed in that order, so the rows
+        # come out in index order. Returns the rows (one target per symbol), the tags of the accepting
+        # states and the position set of every state.
+        start_state = frozenset(firstpos)
+        state_ids = {start_state: 0}
+        states = [start_state]
+        rows = []
+        tags = {}
+
+        # The empty set is the dead state: every symbol leads from it back to itself
+        for state, T in enumerate(states):
+            row = []
             for symbol in symbols:
                 U = set()
                 for pos in T:
-                    if pos in followpos_table and ast_by_position[pos].value == symbol:
+                    if pos in followpos_table and symbol in self.leaf_symbols(ast_by_position[pos]):
                         U.update(followpos_table[pos])
                 U = frozenset(U)
-                if U:
-                    if U not in dfa_states:
-                        dfa_states.add(U)
-                        unmarked_states.append(U)
-                    dfa_transitions[T][symbol] = U
+                target = state_ids.get(U)
+                if target is None:
+                    target = state_ids[U] = len(states)
+                    states.append(U)
+                    self.check_state_limit(len(states), max_states)
+                row.append(target)
+            rows.append(row)
+            markers = [self.end_markers[ast_by_position[pos].value] for pos in T
+                       if ast_by_position[pos].value in self.end_markers]
+            if markers:
+                tags[state] = min(markers)
+
+        return rows, tags, states
+
+
+    def subset_construction_bitset(self, firstpos, symbols, followpos_table, ast_by_position, max_states=None):
+        # Build the DFA states as integer bitmasks of positions, where bit p stands for position p.
+        # Each transition is one AND with the symbol's mask plus an OR over the surviving followpos masks.
+        # Indexing and results are the same as subset_construction, except that the states are returned
+        # as masks.
+        symbol_masks, accept_mask, follow_masks = self.position_masks(symbols, followpos_table, ast_by_position)
+        marker_tags = {pos: self.end_markers[leaf.value] for pos, leaf in ast_by_position.items()
+                       if leaf.value in self.end_markers}
+        masks = [symbol_masks[symbol] for symbol in symbols]
+
+        # Unions for masks with several surviving positions repeat across states, so a bounded number
+        # of them is memoized; the memo is cleared when full to keep memory linear in the states
+        union_cache = {}
+        cache_limit = 4096
+        start_state = self.positions_to_mask(firstpos)
+        state_ids = {start_state: 0}
+        states = [start_state]
+        rows = []
+        tags = {}
+
+        # 0 is the dead state: every symbol leads from it back to itself
+        for state, T in enumerate(states):
+            row = []
+            for mask in masks:
+                hits = T & mask
+                if not hits & (hits - 1):
+                    # No or one surviving position
+                    U = follow_masks[hits.bit_length() - 1] if hits else 0
                 else:
-                    # Handling dead state
-                    dead_state = frozenset()
-                    if dead_state not in dfa_states:
-                        dfa_states.add(dead_state)
-                        dfa_transitions[dead_state] = {s: dead_state for s in symbols}
-                    dfa_transitions[T][symbol] = dead_state
-            if any(pos in ast_by_position for pos in T if ast_by_position[pos].value == '#'):
-                dfa_accept_states.add(T)
-
-        # Create a mapping from state sets to state names
-        state_map = {state: f'q{index}' for index, state in enumerate(dfa_states)}
-        dfa_start_state = state_map[start_state]
-        dfa_accept_states = {state_map[state] for state in dfa_accept_states}
-        dfa_transitions = {
-            state_map[state]: {symbol: state_map[next_state] for symbol, next_state in trans.items()}
-            for state, trans in dfa_transitions.items()
-        }
+                    U = union_cache.get(hits)
+                    if U is None:
+                        if len(union_cache) >= cache_limit:
+                            union_cache.clear()
+                        U = union_cache[hits] = self.follow_union(hits, follow_masks)
+                target = state_ids.get(U)
+                if target is None:
+                    target = state_ids[U] = len(states)
+                    states.append(U)
+                    self.check_state_limit(len(states), max_states)
+                row.append(target)
+            rows.append(row)
+            accepting = T & accept_mask
+            if accepting:
+                tags[state] = min(marker_tags[pos] for pos in self.mask_to_positions(accepting))
+
+        return rows, tags, states
+
+
+    def prefer_bitset(self, firstpos, symbols, followpos_table, ast_by_position, probe=64):
+        # Decide whether the bitset construction is the faster one. A bitset transition costs time
+        # proportional to the number of positions whatever the state size, a set transition time
+        # proportional to the positions in the state: about one set position per thousand positions of
+        # width. Small patterns always use bitsets; for wider ones the first probe states are built as
+        # sets to estimate the mean state size.
+        positions = len(followpos_table)
+        if positions <= 1024:
+            return True
+        start_state = frozenset(firstpos)
+        seen = {start_state}
+        states = [start_state]
+        for T in states:
+            if len(states) >= probe:
+                break
+            for symbol in symbols:
+                U = frozenset(follow for pos in T if symbol in self.leaf_symbols(ast_by_position[pos])
+                              for follow in followpos_table[pos])
+                if U not in seen:
+                    seen.add(U)
+                    states.append(U)
+        return sum(len(state) for state in states) * 1000 >= positions * len(states)
+
+
+    def check_state_limit(self, states, max_states):
+        # Raise StateLimitError once the number of discovered states goes over max_states
+        if max_states is not None and states > max_states:
+            raise StateLimitError(f"DFA has more than {max_states} states", max_states)
+
+
+    def position_masks(self, symbols, followpos_table, ast_by_position):
+        # Precompute the bitmasks used by the bitset construction: the positions labelled with each
+        # symbol, the positions of the end marker and the followpos set of every position
+        symbol_masks = dict.fromkeys(symbols, 0)
+        accept_mask = 0
+        for pos, leaf in ast_by_position.items():
+            if leaf.value in self.end_markers:
+                accept_mask |= 1 << pos
+                continue
+            for symbol in self.leaf_symbols(leaf):
+                if symbol in symbol_masks:
+                    symbol_masks[symbol] |= 1 << pos
+
+        follow_masks = [0] * (max(followpos_table, default=0) + 1)
+        for pos, follows in followpos_table.items():
+            follow_masks[pos] = self.positions_to_mask(follows)
+        return symbol_masks, accept_mask, follow_masks
+
+
+    def follow_union(self, hits, follow_masks):
+        # OR together the followpos masks of every position set in hits
+        result = 0
+        while hits:
+            low = hits & -hits
+            result |= follow_masks[low.bit_length() - 1]
+            hits ^= low
+        return result
+
+
+    def positions_to_mask(self, positions):
+        # Convert a set of positions into an integer bitmask
+        mask = 0
+        for pos in positions:
+            mask |= 1 << pos
+        return mask
+
+
+    def mask_to_positions(self, mask):
+        # Convert an integer bitmask back into the set of positions it encodes
+        positions = []
+        while mask:
+            low = mask & -mask
+            positions.append(low.bit_length() - 1)
+            mask ^= low
+        return frozenset(positions)
+
+
+class StateKey:
+    # Stands in for the position set of a DFA state in a set: it hashes like the position set, and
+    # distinct states are never equal, so a set of keys iterates in the same order as the position sets
+    __slots__ = ('state', 'hash')
+
+    def __init__(self, state, hash):
+        self.state = state
+        self.hash = hash
+
+    def __hash__(self):
+        return self.hash
+
 
-        return DFA(dfa_start_state, dfa_accept_states, dfa_transitions)
+class StateLimitError(ValueError):
+    def __init__(self, message: str, limit: int):
+        self.message: str = message
+        self.limit: int = limit
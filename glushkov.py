@@ -0,0 +1,98 @@
+from dfa import StateLimitError
+from instrument import phase
+
+
+class GlushkovMatcher:
+    def __init__(self, dfa_constructor, max_cached=None):
+        # Simulate the position (Glushkov) automaton described by the followpos table without building
+        # a DFA. The active positions are one integer bitmask, as in DFAConstructor.subset_construction_bitset.
+        # Following a set of positions is done a byte of positions at a time: a byte with a single bit
+        # set reads that position's followpos mask directly, and the union for a byte with several bits
+        # set is computed on first use and cached. The cache holds at most max_cached unions (by default
+        # one per position) and is cleared when full, so memory stays within a constant factor of the
+        # followpos masks themselves (O(positions) setup time).
+        ast = dfa_constructor.ast
+        with phase(dfa_constructor.tracer, 'glushkov'):
+            ast_by_position = {}
+            dfa_constructor.build_ast_by_position(ast, ast_by_position)
+            symbols = sorted(set(dfa_constructor.parser.lexer.alphabet) - {'$'})
+            self.symbol_masks, self.accept_mask, self.follow_masks = dfa_constructor.position_masks(
+                symbols, dfa_constructor.followpos_table, ast_by_position)
+            self.start_state = dfa_constructor.positions_to_mask(ast.firstpos)
+        self.max_cached = len(self.follow_masks) if max_cached is None else max_cached
+        self.byte_unions = {}  # (byte offset << 8) | byte value -> union of the followpos masks of its positions
+
+
+    def byte_union(self, shift, byte):
+        # Return the union of the followpos masks of the positions set in byte, which starts at bit shift
+        key = (shift << 5) | byte
+        union = self.byte_unions.get(key)
+        if union is None:
+            union = 0
+            follow_masks = self.follow_masks
+            bits = byte
+            while bits:
+                low = bits & -bits
+                union |= follow_masks[shift + low.bit_length() - 1]
+                bits ^= low
+            if len(self.byte_unions) >= self.max_cached:
+                self.byte_unions.clear()
+            self.byte_unions[key] = union
+        return union
+
+
+    def step(self, state, symbol):
+        # Return the positions active after reading symbol from the given positions
+        hits = state & self.symbol_masks.get(symbol, 0)
+        follow_masks = self.follow_masks
+        result = 0
+        while hits:
+            low = hits & -hits
+            pos = low.bit_length() - 1
+            shift = pos & ~7
+            byte = (hits >> shift) & 0xFF
+            if byte == low >> shift:
+                result |= follow_masks[pos]
+            else:
+                result |= self.byte_union(shift, byte)
+            hits ^= byte << shift
+        return result
+
+
+    def fullmatch(self, seq):
+        # Check whether the whole sequence of symbols is accepted, stopping once no position is active
+        state = self.start_state
+        step = self.step
+        for symbol in seq:
+            state = step(state, symbol)
+            if not state:
+                return False
+        return bool(state & self.accept_mask)
+
+
+    def match_prefix(self, seq):
+        # Return the length of the longest accepted prefix of the sequence, or None if no prefix is accepted
+        state = self.start_state
+        step = self.step
+        longest = 0 if state & self.accept_mask else None
+        for length, symbol in enumerate(seq, 1):
+            state = step(state, symbol)
+            if not state:
+                break
+            if state & self.accept_mask:
+                longest = length
+        return longest
+
+
+def select_engine(dfa_constructor, max_dfa_states=4096, minimize=False):
+    # Return a DFA when it stays within max_dfa_states states, and a GlushkovMatcher otherwise.
+    # A DFA over p positions has at most 2**p states, so small patterns are built directly.
+    # Larger ones get a subset construction probe that gives up after max_dfa_states states, which
+    # keeps the compile time bounded even for patterns whose DFA blows up.
+    positions = len(dfa_constructor.followpos_table)
+    if positions <= max_dfa_states.bit_length() - 1:
+        return dfa_constructor.construct_dfa(dfa_constructor.ast, minimize=minimize)
+    try:
+        return dfa_constructor.construct_dfa(dfa_constructor.ast, minimize=minimize, max_states=max_dfa_states)
+    except StateLimitError:
+        return GlushkovMatcher(dfa_constructor)
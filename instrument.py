@@ -0,0 +1,118 @@
+import time
+from contextlib import contextmanager
+
+from astnode import postorder
+
+
+class Tracer:
+    # Hooks called around every compilation phase: 'lex', 'parse', 'simplify', 'positions', 'followpos',
+    # 'subset' and, when the DFA is minimized, 'minimize'. The Glushkov engine reports 'glushkov' instead of 'subset'.
+    # Subclass and override the methods you need; the default implementation does nothing.
+
+    def phase_start(self, phase):
+        pass
+
+
+    def phase_end(self, phase, elapsed):
+        pass
+
+
+class CallbackTracer(Tracer):
+    def __init__(self, on_start=None, on_end=None):
+        # Tracer that forwards the hooks to plain callables
+        self.on_start = on_start
+        self.on_end = on_end
+
+
+    def phase_start(self, phase):
+        if self.on_start is not None:
+            self.on_start(phase)
+
+
+    def phase_end(self, phase, elapsed):
+        if self.on_end is not None:
+            self.on_end(phase, elapsed)
+
+
+class CompileStats(Tracer):
+    def __init__(self, tracer=None):
+        # Record the wall time of each phase (seconds, summed if a phase runs more than once) and,
+        # once record_counts has run, the sizes of the artifacts. Hooks are forwarded to tracer.
+        self.tracer = tracer
+        self.phase_times = {}
+        self.tokens = 0
+        self.ast_nodes = 0
+        self.positions = 0
+        self.positions_removed = 0
+        self.dfa_states = 0
+        self.transitions = 0
+        self.dead_transitions = 0
+        self.max_followpos = 0
+
+
+    def phase_start(self, phase):
+        if self.tracer is not None:
+            self.tracer.phase_start(phase)
+
+
+    def phase_end(self, phase, elapsed):
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + elapsed
+        if self.tracer is not None:
+            self.tracer.phase_end(phase, elapsed)
+
+
+    def record_counts(self, lexer, ast, followpos_table, dfa, positions_removed=0):
+        # Count tokens (without EOF), AST nodes, positions, DFA states and transitions;
+        # positions_removed is the number of positions saved by simplification.
+        # dfa may be None (no DFA was built), in which case the DFA counts are set to None.
+        self.positions_removed = positions_removed
+        self.tokens = len(lexer.tokens) - 1
+        self.ast_nodes = sum(1 for _ in postorder(ast))
+        self.positions = len(followpos_table)
+        self.max_followpos = max((len(follows) for follows in followpos_table.values()), default=0)
+        if dfa is None:
+            self.dfa_states = self.transitions = self.dead_transitions = None
+            return
+
+        # Transitions are counted per symbol, whether they are stored, implicit or shared by a symbol class
+        class_sizes = [0] * dfa.num_classes
+        for c in dfa.symbol_index.values():
+            class_sizes[c] += 1
+        self.dfa_states = dfa.num_states
+        self.transitions = 0
+        self.dead_transitions = 0
+        for state in range(dfa.num_states):
+            for c, size in enumerate(class_sizes):
+                target = dfa.target(state, c)
+                if target is not None:
+                    self.transitions += size
+                    self.dead_transitions += size if target == dfa.dead else 0
+
+
+    def as_dict(self):
+        # Return the record as plain data, e.g. for a metrics exporter
+        return {
+            'phase_times': dict(self.phase_times),
+            'tokens': self.tokens,
+            'ast_nodes': self.ast_nodes,
+            'positions': self.positions,
+            'positions_removed': self.positions_removed,
+            'dfa_states': self.dfa_states,
+            'transitions': self.transitions,
+            'dead_transitions': self.dead_transitions,
+            'max_followpos': self.max_followpos,
+        }
+
+
+@contextmanager
+def phase(tracer, name):
+    # Time the enclosed block as the named phase and report it to the tracer, if there is one
+    if tracer is None:
+        yield
+        return
+    tracer.phase_start(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.phase_end(name, time.perf_counter() - start)
@@ -0,0 +1,112 @@
+import sys
+from collections import OrderedDict
+
+
+class LazyDFA:
+    def __init__(self, dfa_constructor, max_states=1024, max_memory=None):
+        # Build the DFA states on demand while matching instead of running the full subset construction.
+        # States are bitmasks of positions (see DFAConstructor.subset_construction_bitset) and their
+        # transitions are kept in an LRU cache bounded by max_states and, optionally, by max_memory bytes.
+        if max_states < 1:
+            raise ValueError("max_states must be a positive integer")
+        ast = dfa_constructor.ast
+        ast_by_position = {}
+        dfa_constructor.build_ast_by_position(ast, ast_by_position)
+        symbols = sorted(set(dfa_constructor.parser.lexer.alphabet) - {'$'})
+
+        self.symbol_masks, self.accept_mask, self.follow_masks = dfa_constructor.position_masks(
+            symbols, dfa_constructor.followpos_table, ast_by_position)
+        self.follow_union = dfa_constructor.follow_union
+        self.start_state = dfa_constructor.positions_to_mask(ast.firstpos)
+        self.max_states = max_states
+        self.max_memory = max_memory
+
+        self.cache = OrderedDict()  # State mask -> {symbol: next state mask}, least recently used first
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def state_size(self, state):
+        # Approximate number of bytes held by a cached state without its transitions
+        return sys.getsizeof(state) + sys.getsizeof({})
+
+
+    def transition_size(self, symbol, next_state):
+        # Approximate number of bytes added by one cached transition
+        return sys.getsizeof(next_state) + 2 * sys.getsizeof(0)
+
+
+    def step(self, state, symbol):
+        # Follow one transition, computing and caching it on a miss
+        row = self.cache.get(state)
+        if row is None:
+            row = self.cache[state] = {}
+            self.memory += self.state_size(state)
+        else:
+            self.cache.move_to_end(state)
+
+        next_state = row.get(symbol)
+        if next_state is not None:
+            self.hits += 1
+            return next_state
+
+        self.misses += 1
+        next_state = self.follow_union(state & self.symbol_masks.get(symbol, 0), self.follow_masks)
+        row[symbol] = next_state
+        self.memory += self.transition_size(symbol, next_state)
+        self.evict()
+        return next_state
+
+
+    def evict(self):
+        # Drop least recently used states until the cache fits its limits; the current state is never dropped
+        while len(self.cache) > 1 and (len(self.cache) > self.max_states or
+                                       (self.max_memory is not None and self.memory > self.max_memory)):
+            state, row = self.cache.popitem(last=False)
+            self.memory -= self.state_size(state)
+            for symbol, next_state in row.items():
+                self.memory -= self.transition_size(symbol, next_state)
+            self.evictions += 1
+
+
+    def fullmatch(self, seq):
+        # Check whether the whole sequence of symbols is accepted, stopping early in the dead state
+        state = self.start_state
+        for symbol in seq:
+            state = self.step(state, symbol)
+            if not state:
+                return False
+        return bool(state & self.accept_mask)
+
+
+    def match_prefix(self, seq):
+        # Return the length of the longest accepted prefix of the sequence, or None if no prefix is accepted
+        state = self.start_state
+        longest = 0 if state & self.accept_mask else None
+        for length, symbol in enumerate(seq, 1):
+            state = self.step(state, symbol)
+            if not state:
+                break
+            if state & self.accept_mask:
+                longest = length
+        return longest
+
+
+    def cache_info(self):
+        # Return the cache counters and current size
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'states': len(self.cache),
+            'memory': self.memory,
+        }
+
+
+    def clear_cache(self):
+        # Forget every cached state and reset the counters
+        self.cache.clear()
+        self.memory = 0
+        self.hits = self.misses = self.evictions = 0
@@ -1,37 +1,130 @@
+import logging
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from instrument import phase
+
+logger = logging.getLogger(__name__)
+
+
 class Token:
-    def __init__(self, type, value):
+    __slots__ = ('type', 'value', 'position')
+
+    def __init__(self, type, value, position=None):
         self.type = type
         self.value = value
+        self.position = position  # Offset of the token in the source regex
+
+
+class SymbolTrie:
+    def __init__(self, symbols):
+        # Build a character trie over the alphabet symbols; the None key marks the end of a symbol
+        self.root = {}
+        for symbol in symbols:
+            if not symbol:
+                continue
+            node = self.root
+            for char in symbol:
+                node = node.setdefault(char, {})
+            node[None] = symbol
+
+
+    def segment(self, string):
+        # Split the string into alphabet symbols in one left-to-right pass (O(n * L) time complexity,
+        # where L is the length of the longest symbol). Returns the symbols of one segmentation
+        # (None if there is none) and the number of segmentations, capped at 2.
+        n = len(string)
+        ways = [0] * (n + 1)  # Number of ways to form string[:i], capped at 2
+        ways[0] = 1
+        previous = [None] * (n + 1)  # (start, symbol) of the last symbol of one way to form string[:i]
+        root = self.root
+
+        for i in range(n):
+            if not ways[i]:
+                continue
+            node = root
+            j = i
+            while j < n:
+                node = node.get(string[j])
+                if node is None:
+                    break
+                j += 1
+                symbol = node.get(None)
+                if symbol is not None:
+                    ways[j] = min(2, ways[j] + ways[i])
+                    if previous[j] is None:
+                        previous[j] = (i, symbol)
+
+        if not ways[n]:
+            return None, 0
+        tokens = []
+        i = n
+        while i > 0:
+            i, symbol = previous[i]
+            tokens.append(symbol)
+        tokens.reverse()
+        return tokens, ways[n]
+
+
+@lru_cache(maxsize=64)
+def symbol_trie(alphabet: frozenset) -> SymbolTrie:
+    # Return the trie for the alphabet, shared by every lexer that uses the same alphabet
+    return SymbolTrie(alphabet)
 
 
 class Lexer:
-    def __init__(self, regex, alphabet):
-        # Initialize the lexer with the given regex and alphabet
+    def __init__(self, regex, alphabet, tracer=None):
+        # Initialize the lexer with the given regex and alphabet.
+        # The optional tracer (see instrument.Tracer) is also used by the parser and DFAConstructor.
         self.regex = regex
-        self.alphabet = alphabet
+        self.tracer = tracer
+        self.alphabet = set(alphabet)  # Copy so the caller's set is left untouched
         self.alphabet.add('$')  # Add epsilon symbol to the alphabet
+        self.trie = symbol_trie(frozenset(self.alphabet))  # Index used to split runs of symbols
         self.index = 0 
-        self.processed_regex = self.process_regex(regex)  # Process the regex to handle concatenation and escape sequences
-        print(self.processed_regex)
+        self.source_offsets = []  # Processed regex offset -> source regex offset, filled by process_regex
+        with phase(tracer, 'lex'):
+            self.processed_regex = self.process_regex(regex)  # Process the regex to handle concatenation and escape sequences
+            self.tokens = self.tokenize()  # Immutable token stream, ending with an EOF token
+        logger.debug("Processed regex: %s", self.processed_regex)
+        self.token_index = 0
         
         
     def peek(self) -> Token:
-        old_index: int = self.index
-        token: Token = self.next()
-        self.index = old_index
-        return token
+        # Return the next token without consuming it (O(1) time complexity)
+        return self.tokens[self.token_index]
     
     
     def next(self) -> Token:
-        # Get the next token from the processed regex (O(n) time complexity)
+        # Consume and return the next token; EOF is returned repeatedly at the end (O(1) time complexity)
+        token = self.tokens[self.token_index]
+        if token.type != 'EOF':
+            self.token_index += 1
+        return token
+
+
+    def tokenize(self) -> tuple:
+        # Scan the whole processed regex once and return its tokens (O(n) time complexity)
+        self.index = 0
+        tokens = []
+        while True:
+            token = self.scan()
+            tokens.append(token)
+            if token.type == 'EOF':
+                return tuple(tokens)
+
+
+    def scan(self) -> Token:
+        # Scan the next token from the processed regex, starting at self.index
         
         while self.index < len(self.processed_regex) and self.processed_regex[self.index].isspace():
             # Skip any whitespace characters
             self.index += 1
 
+        start = self.index
         if self.index == len(self.processed_regex):
             # End of input reached
-            return Token(type='EOF', value='EOF')
+            return Token(type='EOF', value='EOF', position=self.source_position(start))
         elif self.index > len(self.processed_regex):
             # Index out of bounds
             raise Exception()
@@ -45,14 +138,18 @@ class Lexer:
                 if self.processed_regex[self.index] in self.alphabet:
                     char = self.processed_regex[self.index]
                     self.index += 1
-                    return Token(type='SYMBOL', value=char)
+                    return Token(type='SYMBOL', value=char, position=self.source_position(start))
                 else:
-                    raise LexerError(f"Invalid escape sequence: {self.processed_regex[self.index]}", self.index)
+                    raise LexerError(f"Invalid escape sequence: {self.processed_regex[self.index]}", self.source_position(self.index))
             else:
-                raise LexerError(f"Reached end of regex", self.index)
+                raise LexerError(f"Reached end of regex", self.source_position(self.index))
+
+        if char == '[':
+            # Handle character classes
+            return Token(type='CLASS', value=self.scan_class(), position=self.source_position(start))
 
         if char in '+*().{},':  # Check if the character is an operator
-            return Token(type='OPERATOR', value=char)
+            return Token(type='OPERATOR', value=char, position=self.source_position(start))
         else:
             # Handle numbers and symbols
             if char.isdigit() and char not in self.alphabet:
@@ -62,7 +159,7 @@ class Lexer:
                     buffer.append(self.processed_regex[self.index])
                     self.index += 1
                 value = ''.join(buffer)
-                return Token(type='NUMBER', value=value)
+                return Token(type='NUMBER', value=value, position=self.source_position(start))
             else:
                 # Read alphanumeric symbols
                 buffer = [char]
@@ -71,31 +168,72 @@ class Lexer:
                     self.index += 1
                 value = ''.join(buffer)
                 if value in self.alphabet:
-                    return Token(type='SYMBOL', value=value)
+                    return Token(type='SYMBOL', value=value, position=self.source_position(start))
                 else:
-                    raise LexerError(f"Unexpected token: {value}", self.index)
+                    raise LexerError(f"Unexpected token: {value}", self.source_position(self.index))
                  
 
-    def get_symbol_list(self, string : str) -> list[str]:
-        # Get a list of symbols from the input string, ensuring no ambiguity (O(n^2) time complexity
-        self.check_ambigous_string(string)  # Check for ambiguity in the string
-        token_set = set(self.alphabet)
-        n = len(string)
-        dp = [False] * (n + 1)  # Dynamic programming table to store whether a substring can be formed
-        dp[0] = True  # Empty string can always be formed
-        tokenized_result = [[] for _ in range(n + 1)]  # List to store the resulting tokens
-
-        for i in range(1, n + 1):
-            for j in range(i):
-                if dp[j] and string[j:i] in token_set:
-                    dp[i] = True
-                    tokenized_result[i] = tokenized_result[j] + [string[j:i]]
-                    break  # No need to check further if the substring can be formed
-
-        if dp[n]:
-            return tokenized_result[n]  # Return the list of tokens if the string can be formed
-        else:
-            raise LexerError(f"String {string} cannot be formed by alphabet {self.alphabet}", self.index)
+    def scan_class(self) -> frozenset:
+        # Scan the body of a character class after '[' and return the set of symbols it matches
+        # (O(n * L + |alphabet|) time complexity). Members are symbols, escaped symbols or ranges
+        # 'x-y' over the sorted alphabet; a leading '^' negates the class.
+        negated = self.index < len(self.processed_regex) and self.processed_regex[self.index] == '^'
+        if negated:
+            self.index += 1
+
+        atoms = []  # Symbols in order, with None standing for a range dash
+        buffer = []
+        while True:
+            if self.index >= len(self.processed_regex):
+                raise LexerError("Unterminated character class", self.source_position(self.index))
+            char = self.processed_regex[self.index]
+            self.index += 1
+            if char in ']-\\' and buffer:
+                atoms.extend(self.get_symbol_list(''.join(buffer), self.source_position(self.index - 1 - len(buffer))))
+                buffer.clear()
+            if char == ']':
+                break
+            if char == '-':
+                atoms.append(None)
+            elif char == '\\':
+                if self.index < len(self.processed_regex) and self.processed_regex[self.index] in self.alphabet:
+                    atoms.append(self.processed_regex[self.index])
+                    self.index += 1
+                else:
+                    raise LexerError("Invalid escape sequence in character class", self.source_position(self.index))
+            elif not char.isspace():
+                buffer.append(char)
+
+        ordered = sorted(self.alphabet - {'$'})
+        members = set()
+        i = 0
+        while i < len(atoms):
+            if i + 2 < len(atoms) and atoms[i + 1] is None and atoms[i] is not None and atoms[i + 2] is not None:
+                low, high = atoms[i], atoms[i + 2]
+                if high < low:
+                    raise LexerError(f"Invalid range in character class: {low}-{high}", self.source_position(self.index))
+                members.update(ordered[bisect_left(ordered, low):bisect_right(ordered, high)])
+                i += 3
+            elif atoms[i] is None:
+                raise LexerError("Range in character class is missing an end", self.source_position(self.index))
+            else:
+                members.add(atoms[i])
+                i += 1
+        members.discard('$')
+
+        if negated:
+            members = set(ordered) - members
+        if not members:
+            raise LexerError("Character class matches no symbol", self.source_position(self.index))
+        return frozenset(members)
+
+
+    def get_symbol_list(self, string : str, position: int = None) -> list[str]:
+        # Get a list of symbols from the input string, ensuring no ambiguity (O(n * L) time complexity).
+        # position is the source offset reported if the string cannot be split (self.index by default).
+        tokens, ways = self.trie.segment(string)
+        self.check_segmentation(string, ways, position)
+        return tokens
         
         
     def insert_concatenation_operators(self, tokens: list[str]) -> str:
@@ -109,78 +247,113 @@ class Lexer:
 
 
     def process_regex(self, regex: str) -> str:
-        # Process the regex to handle concatenation and escape sequences (O(n^2) time complexity
+        # Process the regex to handle concatenation and escape sequences (O(n * L) time complexity).
+        # Also fills self.source_offsets, which maps every offset of the processed regex (and its end)
+        # back to the source regex; inserted '.' and '$' map to the source character they precede.
         n = len(regex)
         buffer = []  # Buffer to store consecutive characters
         result = []  # Result to store the processed regex
+        offsets = []  # Source offset of every processed character
         i = 0
 
+        def emit(text, offset):
+            # Append text taken from (or inserted at) the given source offset
+            result.append(text)
+            offsets.extend(range(offset, offset + len(text)) if len(text) > 1 else [offset])
+
+        def flush(end):
+            # Split the buffered run regex[end - len(buffer):end] into symbols joined by '.'
+            source = end - len(buffer)
+            tokens = self.get_symbol_list(''.join(buffer), source)
+            result.append(self.insert_concatenation_operators(tokens))
+            for k, token in enumerate(tokens):
+                if k:
+                    offsets.append(source)
+                offsets.extend(range(source, source + len(token)))
+                source += len(token)
+            buffer.clear()
+
         while i < n:
             char = regex[i]
-            if char in '+*()}{\\':
+            if char == '[':
+                # Copy a character class through unchanged; it becomes a single token
+                if buffer:
+                    flush(i)
+                if result and result[-1] not in "().+*{\\":
+                    emit('.', i)
+                end = i + 1
+                while end < n and regex[end] != ']':
+                    end += 2 if regex[end] == '\\' else 1
+                emit(regex[i:end + 1], i)
+                i = end
+                if i < n - 1 and regex[i + 1] not in ").+*}{":
+                    emit('.', i + 1)
+            elif char in '+*()}{\\':
                 # Handle operators and escape sequences
                 if buffer:
-                    tokens = self.get_symbol_list(''.join(buffer))
-                    result.append(self.insert_concatenation_operators(tokens))
-                    buffer.clear()  # Clear the buffer after processing
+                    flush(i)  # Clear the buffer after processing
 
                 # Insert concatenation operator if needed
                 if char == '(' and result and result[-1] not in "().+*{\\":
-                    result.append('.')
+                    emit('.', i)
                 if char == '\\' and result and result[-1] not in "().+*{\\":
-                    result.append('.')
+                    emit('.', i)
                 if char == '+' and i == 0:
-                    result.append('$')
+                    emit('$', i)
                 
-                result.append(char)
+                emit(char, i)
                 
                 # Handle special cases for operators and escape sequences
                 if char == '(' and regex[i+1] == ')' and i < n - 1:
-                    result.append('$')
+                    emit('$', i + 1)
                 if char == '\\' and i < n - 1:
-                    result.append(regex[i + 1])
+                    emit(regex[i + 1], i + 1)
                     i += 1
                     if i < n - 1 and regex[i + 1] not in ").+*}{":
-                        result.append('.')
+                        emit('.', i + 1)
                 if char == '+' and i < n - 1 and regex[i + 1] == '+':
-                    result.append('$')
+                    emit('$', i + 1)
                 if char == '+' and i == n - 1:
-                    result.append('$')
+                    emit('$', i + 1)
                 if char in '*)}' and i < n - 1 and regex[i + 1] not in ").+*}{":
-                    result.append('.')
+                    emit('.', i + 1)
                 if char == '{':
                     while i < n and regex[i + 1] != '}':
                         i += 1
-                        result.append(regex[i])
+                        emit(regex[i], i)
             else:
                 buffer.append(char)
             i += 1
 
         if buffer:
             # Process remaining buffer
-            tokens = self.get_symbol_list(''.join(buffer))
-            result.append(self.insert_concatenation_operators(tokens))
+            flush(n)
+        offsets.append(n)
+        self.source_offsets = offsets
         return ''.join(result)
+
+
+    def source_position(self, index: int) -> int:
+        # Map an offset into the processed regex back to the source regex
+        offsets = self.source_offsets
+        return offsets[index] if index < len(offsets) else len(self.regex)
     
     
     def check_ambigous_string(self, string: str):
-        # Check if the string can be formed in more than one way using the alphabet (O(n^2) time complexity)
-        n = len(string)
-        dp = [0] * (n + 1)  # Dynamic programming table to store the number of ways to form substrings
-        dp[0] = 1  # There is one way to form an empty string
-        alphabet_set = set(self.alphabet)
+        # Check if the string can be formed in more than one way using the alphabet (O(n * L) time complexity)
+        _, ways = self.trie.segment(string)
+        self.check_segmentation(string, ways)
 
-        for i in range(1, n + 1):
-            for j in range(i):
-                if string[j:i] in alphabet_set:
-                    dp[i] += dp[j]  # Add the number of ways to form the substring [j:i]
 
-        if dp[n] < 1:
+    def check_segmentation(self, string: str, ways: int, position: int = None):
+        # Raise if the string cannot be formed by the alphabet or can be formed in more than one way
+        position = self.index if position is None else position
+        if ways < 1:
             # If the string cannot be formed
-            raise LexerError(f"String {string} cannot be formed by alphabet {self.alphabet}", self.index)
-        if dp[n] > 1:
+            raise LexerError(f"String {string} cannot be formed by alphabet {self.alphabet}", position)
+        if ways > 1:
             # If the string can be formed in more than one way
-            raise LexerError(f"String {string} can be formed by alphabet {self.alphabet} in more than one way", self.index)
+            raise LexerError(f"String {string} can be formed by alphabet {self.alphabet} in more than one way", position)
 
         
         
@@ -4,14 +4,19 @@ from astnode import *
 from dfa import *
 from parse import *
 from lexer import *
+from compiler import CompiledRegex
 
 def main():
     alphabet = {"a","b","c"}
     regex = "(abc+((ab*+c+b*)))(abc+((ab*+$+b*)))**+c*"
     
     try:
-        lexer = Lexer(regex, alphabet)
-        DFAConstructor(lexer)
+        compiled = CompiledRegex(regex, alphabet)
+        print(compiled.lexer.processed_regex)
+        compiled.parser.print_ast(compiled.ast)
+        for pos, follows in compiled.followpos_table.items():
+            print(f"Position {pos}: Follow positions -> {follows}")
+        compiled.dfa.print_dfa()
     except LexerError as e:
         print("Lexer error at position", e.position)
         print(e.message)
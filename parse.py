@@ -1,45 +1,49 @@
-from astnode import ASTNode
+from astnode import ASTNode, leaves, postorder, preorder
+from instrument import phase
 from lexer import Token, Lexer
 
 class Parser:
     def __init__(self, lexer):
         self.lexer: Lexer = lexer
+        self.tracer = lexer.tracer
+        self.tokens = lexer.tokens  # Token stream produced once by the lexer
+        self.index = 0  # Index of the next token to consume
     
     
     def print_ast(self, node, indent=0):
         # Print the abstract syntax tree (AST) (O(n) time complexity)
         if node is None:
             return
-        indent_str = ' ' * indent
-        if node.type == 'SYMBOL' or node.type == 'EPSILON':
-            print(f"{indent_str}{node.type}('{node.value}', pos={node.position})")
-        elif node.type == 'STAR':
-            print(f"{indent_str}{node.type}(pos={node.position})")
-            self.print_ast(node.value, indent + 2)
-        elif node.type in {'CONCAT', 'UNION'}:
-            print(f"{indent_str}{node.type}(pos={node.position})")
-            self.print_ast(node.left, indent + 2)
-            self.print_ast(node.right, indent + 2)
+        print(self.format_ast(node, indent))
+
+
+    def format_ast(self, node, indent=0):
+        # Render the abstract syntax tree (AST) as indented text, one node per line (O(n) time complexity)
+        lines = []
+        for node, depth in preorder(node):
+            indent_str = ' ' * (indent + 2 * depth)
+            if node.type == 'SYMBOL' or node.type == 'EPSILON':
+                lines.append(f"{indent_str}{node.type}('{node.value}', pos={node.position})")
+            elif node.type == 'CLASS':
+                lines.append(f"{indent_str}{node.type}({sorted(node.value)}, pos={node.position})")
+            else:
+                lines.append(f"{indent_str}{node.type}(pos={node.position})")
+        return '\n'.join(lines)
 
 
     def assign_positions(self, node, position=1):
-        # Assign positions to each node in the AST (O(n) time complexity)
-        if node is None:
-            return position
-        if node.type == 'SYMBOL':
-            node.position = position
-            return position + 1
-        if node.type == 'CONCAT' or node.type == 'UNION':
-            position = self.assign_positions(node.left, position)
-            position = self.assign_positions(node.right, position)
-        elif node.type == 'STAR':
-            position = self.assign_positions(node.value, position)
+        # Number the SYMBOL and CLASS leaves from left to right and return the next free position
+        # (O(n) time complexity)
+        for leaf in leaves(node):
+            leaf.position = position
+            position += 1
         return position
 
 
-    def parse(self):
-        # Parse the regex and return the root of the AST (O(n) time complexity)
-        head = ASTNode('CONCAT', left=self.regex_rule(), right=ASTNode('SYMBOL', value='#'))
+    def parse(self, end_marker='#'):
+        # Parse the regex and return the root of the AST, ending in the end marker symbol (O(n) time complexity)
+        with phase(self.tracer, 'parse'):
+            head = ASTNode('CONCAT', left=self.regex_rule(), right=ASTNode('SYMBOL', value=end_marker))
         return head
 
 
@@ -73,12 +77,12 @@ class Parser:
         node = self.factor()
         while self.peek().value == '*':
             self.consume('*')
-            node = ASTNode('STAR', value=node)
+            node = ASTNode('STAR', left=node)
         return node
 
 
     def factor(self):
-        # Parse a factor, which can be a symbol, epsilon, or a sub-expression in parentheses
+        # Parse a factor, which can be a symbol, a character class, epsilon, or a sub-expression in parentheses
         if self.peek().value == '(':
             self.consume('(')
             node = self.regex_rule()
@@ -90,53 +94,62 @@ class Parser:
         elif self.peek().value == '$':  # Handle epsilon
             self.consume('$')
             return ASTNode('EPSILON')
-        elif self.peek().type == 'SYMBOL':
-            symbol = self.consume().value
-            node = ASTNode('SYMBOL', value=symbol)
+        elif self.peek().type in {'SYMBOL', 'CLASS'}:
+            # A character class is a single leaf holding its set of symbols, so it takes one position
+            token = self.consume()
+            node = ASTNode(token.type, value=token.value)
             # Handle {N}, {N,}, {N,M} syntax for repetition
             if self.peek().value == '{':
                 return self.repeatFunctions(node)
             return node
         else:
-            raise ParserError(f"Unexpected character: {self.peek()}", self.lexer.index)
+            raise ParserError(f"Unexpected character: {self.peek().value}", self.peek().position)
 
 
     def repeatFunctions(self, node):
         # Handle repetition syntax: {N}, {N,}, {N,M}
         self.consume('{')
-        n = self.consume().value
-        if self.peek().value == '}':
-            self.consume('}')
-            return self.repeat(node, int(n))
-        elif self.peek().value == ',':
+        n = self.consume_number()
+        if self.peek().value == ',':
             self.consume(',')
-            if self.lexer.processed_regex[self.lexer.index].isdigit():
-                m = self.consume().value
+            if self.peek().value == '}':
                 self.consume('}')
-                return self.repeat_between(node, int(n), int(m))
-            else:
-                self.consume('}')
-                return self.repeat_at_least(node, int(n))
+                return self.repeat_at_least(node, n)
+            m = self.consume_number()
+            self.consume('}')
+            return self.repeat_between(node, n, m)
+        else:
+            self.consume('}')
+            return self.repeat(node, n)
+
+
+    def consume_number(self):
+        # Consume a repetition bound; anything but a NUMBER token is a syntax error
+        token = self.peek()
+        if token.type != 'NUMBER':
+            raise ParserError(f"Expected a number but got {token.value}", token.position)
+        return int(self.consume().value)
 
 
     def copy_pattern(self, node):
         # Create a deep copy of the pattern in the AST (O(n) time complexity)
-        if node.type == 'SYMBOL' or node.type == 'EPSILON':
-            return ASTNode('SYMBOL', value=node.value)
-        if node.type == 'STAR':
-            return ASTNode('STAR', value=self.copy_pattern(node.value))
-        if node.type in {'CONCAT', 'UNION'}:
-            return ASTNode(node.type, left=self.copy_pattern(node.left), right=self.copy_pattern(node.right))
-        raise ParserError(f"Unknown node type: {node.type}", self.lexer.index)
+        copies = {}  # id(original node) -> copy
+        for original in postorder(node):
+            if original.type not in {'SYMBOL', 'CLASS', 'EPSILON', 'STAR', 'CONCAT', 'UNION'}:
+                raise ParserError(f"Unknown node type: {original.type}", self.peek().position)
+            copies[id(original)] = ASTNode(original.type, value=original.value,
+                                           left=copies.pop(id(original.left), None),
+                                           right=copies.pop(id(original.right), None))
+        return copies[id(node)]
     
     
     def repeat(self, pattern, n):
-        # Repeat the pattern exactly n times (O(n^2) time complexity)
+        # Repeat the pattern exactly n times (O(n * |pattern|) time complexity).
+        # The first repetition reuses the pattern itself, every other one is a fresh copy
+        # because each copy needs its own positions.
         if n < 1:
-            raise ParserError("Number of repetitions must be a positive integer", self.lexer.index)
-        if n == 1:
-            return self.copy_pattern(pattern)
-        current = self.copy_pattern(pattern)
+            raise ParserError("Number of repetitions must be a positive integer", self.peek().position)
+        current = pattern
         for _ in range(1, n):
             current = ASTNode('CONCAT', left=current, right=self.copy_pattern(pattern))
         return current
@@ -145,31 +158,45 @@ class Parser:
     def repeat_at_least(self, pattern, n):
         # Repeat the pattern at least n times, followed by a Kleene star
         if n < 1:
-            raise ParserError("Number of repetitions must be a positive integer", self.lexer.index)
-        return ASTNode('CONCAT', left=self.repeat(pattern, n), right=ASTNode('STAR', value=self.copy_pattern(pattern)))
+            raise ParserError("Number of repetitions must be a positive integer", self.peek().position)
+        star = ASTNode('STAR', left=self.copy_pattern(pattern))
+        return ASTNode('CONCAT', left=self.repeat(pattern, n), right=star)
 
 
     def repeat_between(self, pattern, n, m):
-        # Repeat the pattern between n and m times
+        # Repeat the pattern between n and m times (O(m * |pattern|) time complexity).
+        # p{n,m} is lowered to n mandatory copies followed by m - n nested optional copies:
+        # p...p (p (p (...)?)?)?, where (x)? is written as UNION(x, EPSILON).
         if n < 1 or m < n:
-            raise ParserError("Invalid range for repetition", self.lexer.index)
-        
+            raise ParserError("Invalid range for repetition", self.peek().position)
+
+        # Build the optional tail from the innermost copy outwards
+        optional = None
+        for _ in range(m - n):
+            body = self.copy_pattern(pattern)
+            if optional is not None:
+                body = ASTNode('CONCAT', left=body, right=optional)
+            optional = ASTNode('UNION', left=body, right=ASTNode('EPSILON'))
+
         result = self.repeat(pattern, n)
-        for i in range(n + 1, m + 1):
-            result = ASTNode('UNION', left=result, right=self.repeat(pattern, i))
+        if optional is not None:
+            result = ASTNode('CONCAT', left=result, right=optional)
         return result
 
 
     def peek(self) -> Token:
-        # Peek at the next token without consuming it
-        return self.lexer.peek()
+        # Peek at the next token without consuming it (O(1) time complexity)
+        return self.tokens[self.index]
 
 
     def consume(self, expected=None) -> Token:
         # Consume the next token, optionally checking if it matches an expected value
-        if expected is not None and self.peek().value != expected:
-            raise ParserError(f'Expected {expected} but got {self.peek().value}', self.lexer.index)       
-        return self.lexer.next()
+        token = self.tokens[self.index]
+        if expected is not None and token.value != expected:
+            raise ParserError(f'Expected {expected} but got {token.value}', token.position)
+        if token.type != 'EOF':
+            self.index += 1
+        return token
     
     
 class ParserError(ValueError):
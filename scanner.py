@@ -0,0 +1,74 @@
+from astnode import ASTNode
+from dfa import DFAConstructor
+from lexer import Lexer
+from parse import Parser
+
+
+class Scanner:
+    def __init__(self, patterns, alphabet, minimize=True):
+        # Combine several regexes over a shared alphabet into one tagged DFA.
+        # patterns is a list of (name, regex) pairs; earlier patterns win ties. Each pattern is parsed
+        # with its own end marker, the ASTs are joined with UNION and every accept state of the
+        # resulting DFA is tagged with the index of the first pattern it accepts.
+        if not patterns:
+            raise ValueError("At least one pattern is required")
+        alphabet = set(alphabet)
+        self.names = [name for name, _ in patterns]
+
+        end_markers = {}
+        ast = None
+        lexer = None
+        for tag, (_, regex) in enumerate(patterns):
+            marker = f'#{tag}'
+            while marker in alphabet:
+                marker = '#' + marker
+            end_markers[marker] = tag
+            lexer = Lexer(regex, alphabet)
+            tree = Parser(lexer).parse(end_marker=marker)
+            ast = tree if ast is None else ASTNode('UNION', left=ast, right=tree)
+
+        dfa_constructor = DFAConstructor(lexer, ast=ast, end_markers=end_markers)
+        self.dfa = dfa_constructor.construct_dfa(dfa_constructor.ast, minimize=minimize)
+        self.table = self.dfa.compile()
+
+
+    def match(self, seq, start=0):
+        # Return (tag, end) for the longest non-empty match starting at seq[start], or None.
+        # Among patterns matching the same longest prefix the earliest one wins.
+        table = self.table.table
+        symbol_index = self.table.symbol_index
+        accept_tags = self.table.accept_tags
+        dead = self.table.dead
+        width = self.table.width
+        offset = 0
+        best = None
+        for end in range(start, len(seq)):
+            index = symbol_index.get(seq[end])
+            if index is None:
+                break
+            offset = table[offset + index]
+            if offset == dead:
+                break
+            tag = accept_tags[offset // width]
+            if tag is not None:
+                best = (tag, end + 1)
+        return best
+
+
+    def tokenize(self, seq):
+        # Split the whole sequence of symbols into (name, start, end) tokens using longest match
+        # and first-rule tie-breaking; raises ScannerError where no pattern matches
+        start = 0
+        while start < len(seq):
+            match = self.match(seq, start)
+            if match is None:
+                raise ScannerError(f"No pattern matches at symbol {seq[start]!r}", start)
+            tag, end = match
+            yield self.names[tag], start, end
+            start = end
+
+
+class ScannerError(ValueError):
+    def __init__(self, message: str, position: int):
+        self.message: str = message
+        self.position: int = position
@@ -0,0 +1,129 @@
+import mmap
+
+
+class StreamSearcher:
+    def __init__(self, dfa, report_starts=False, max_states=4096):
+        # Unanchored search driven by a DFA from construct_dfa. Input is fed in chunks with feed();
+        # the automaton state and the absolute offset are carried across chunk boundaries, so memory
+        # does not grow with the input.
+        #
+        # A search state is the set of DFA states of all runs still alive, one run being started at
+        # every offset. These sets are built on demand and cached (the cache is dropped whenever it
+        # grows past max_states). With report_starts=True each DFA state keeps the earliest offset
+        # of the runs that reached it instead, so every match end can be paired with its leftmost start.
+        self.table = dfa.compile()
+        self.report_starts = report_starts
+        self.max_states = max_states
+        self.start = frozenset((0,))
+        self.cache = {}  # Search state -> {symbol class: (next search state, accepting)}
+        self.reset()
+
+
+    def reset(self):
+        # Forget the current position and start searching from offset 0 again
+        self.offset = 0
+        self.state = self.start
+        self.starts = {0: 0}  # DFA state offset -> earliest start offset, used with report_starts
+
+
+    def step(self, state, symbol):
+        # Advance every live run by one symbol and start a new run at the next offset
+        # Transitions are cached per symbol class, so symbols the DFA cannot tell apart share an entry
+        table = self.table
+        index = table.symbol_index.get(symbol)
+        row = self.cache.get(state)
+        if row is None:
+            if len(self.cache) >= self.max_states:
+                self.cache.clear()
+            row = self.cache[state] = {}
+        result = row.get(index)
+        if result is None:
+            next_state = set()
+            if index is not None:
+                for offset in state:
+                    target = table.table[offset + index]
+                    if target != table.dead:
+                        next_state.add(target)
+            # Only runs that consumed at least one symbol count, so empty matches are not reported
+            accepting = any(table.is_accepting(offset // table.width) for offset in next_state)
+            next_state.add(0)
+            result = row[index] = (frozenset(next_state), accepting)
+        return result
+
+
+    def feed(self, chunk):
+        # Consume a chunk of symbols (str, bytes-like or any iterable of symbols) and return the non-empty
+        # matches ending inside it: absolute end offsets, or (start, end) pairs with report_starts=True.
+        # Bytes are read as latin-1 characters, so each byte is one single-character symbol.
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = bytes(chunk).decode('latin-1')
+        if self.report_starts:
+            return self.feed_with_starts(chunk)
+
+        matches = []
+        state = self.state
+        offset = self.offset
+        step = self.step
+        for symbol in chunk:
+            offset += 1
+            state, accepting = step(state, symbol)
+            if accepting:
+                matches.append(offset)
+        self.state = state
+        self.offset = offset
+        return matches
+
+
+    def feed_with_starts(self, chunk):
+        # feed() variant that tracks the earliest start offset reaching each DFA state
+        table = self.table
+        symbol_index = table.symbol_index
+        dead = table.dead
+        width = table.width
+        matches = []
+        starts = self.starts
+        offset = self.offset
+        for symbol in chunk:
+            offset += 1
+            index = symbol_index.get(symbol)
+            next_starts = {}
+            if index is not None:
+                for state, start in starts.items():
+                    target = table.table[state + index]
+                    if target != dead and (target not in next_starts or start < next_starts[target]):
+                        next_starts[target] = start
+            leftmost = None
+            for state, start in next_starts.items():
+                if table.is_accepting(state // width) and (leftmost is None or start < leftmost):
+                    leftmost = start
+            if leftmost is not None:
+                matches.append((leftmost, offset))
+            if 0 not in next_starts:
+                next_starts[0] = offset
+            starts = next_starts
+        self.starts = starts
+        self.offset = offset
+        return matches
+
+
+def iter_chunks(source, chunk_size=1 << 16):
+    # Yield chunks from a file object, a str/bytes/mmap buffer or an iterable of chunks
+    if hasattr(source, 'read') and not isinstance(source, mmap.mmap):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    elif isinstance(source, (str, bytes, bytearray, memoryview, mmap.mmap)):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+    else:
+        yield from source
+
+
+def search(dfa, source, chunk_size=1 << 16, report_starts=False):
+    # Search the whole source for matches of the DFA's language, yielding them as they are found.
+    # Only one chunk is held in memory at a time, so this works on inputs of any size.
+    searcher = StreamSearcher(dfa, report_starts=report_starts)
+    for chunk in iter_chunks(source, chunk_size):
+        yield from searcher.feed(chunk)
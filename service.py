@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import cache_key
+from compiler import compile
+from lexer import LexerError
+from parse import ParserError
+
+
+def compile_dfa(regex, alphabet, minimize=False):
+    # Executor task: compile one regex and return its DFA (picklable, so process pools work too)
+    return compile(regex, set(alphabet), minimize).dfa
+
+
+def match_batch(items):
+    # Executor task: run a batch of (dfa, sequence) matches and return the results in order
+    return [dfa.fullmatch(seq) for dfa, seq in items]
+
+
+class LatencyWindow:
+    def __init__(self, size=1024):
+        # Keep the last size latencies (seconds) plus running totals
+        self.recent = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+    def add(self, elapsed):
+        self.recent.append(elapsed)
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+
+    def as_dict(self):
+        # Summary of the window: count, mean and max over everything, percentiles over the recent latencies
+        ordered = sorted(self.recent)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': percentile(0.5),
+            'p99': percentile(0.99),
+        }
+
+
+class RegexService:
+    def __init__(self, executor=None, max_entries=256, batch_window=0.001, max_batch=256):
+        # Asynchronous compile-and-match front end. Compilation runs in executor (the event loop's default
+        # thread pool if None; pass a ProcessPoolExecutor to use several cores), so construct_dfa never
+        # blocks the event loop. Concurrent compiles of the same (regex, alphabet, minimize) share one
+        # in-flight future, and compiled DFAs are kept in an LRU of max_entries. Match requests are queued
+        # for up to batch_window seconds (or until max_batch are waiting) and run as one executor call.
+        self.executor = executor
+        self.max_entries = max_entries
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.automata = OrderedDict()  # Key -> DFA, least recently used first
+        self.inflight = {}  # Key -> future of a running compile
+        self.pending = []  # Queued (dfa, sequence, future) match requests
+        self.flush_handle = None
+        self.compiles = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.compile_latency = LatencyWindow()
+        self.match_latency = LatencyWindow()
+
+
+    async def compile(self, regex, alphabet, minimize=False):
+        # Return (key, DFA) for the regex, compiling it in the executor unless it is cached or already
+        # being compiled. Raises LexerError or ParserError for invalid regexes.
+        start = time.perf_counter()
+        key = cache_key(regex, alphabet, minimize)
+        dfa = self.automata.get(key)
+        if dfa is not None:
+            self.automata.move_to_end(key)
+            self.cache_hits += 1
+        else:
+            future = self.inflight.get(key)
+            if future is None:
+                self.compiles += 1
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(self.executor, compile_dfa, regex, sorted(set(alphabet)), minimize)
+                self.inflight[key] = future
+                future.add_done_callback(lambda done: self.compiled(key, done))
+            else:
+                self.coalesced += 1
+            # Shield the shared future so one cancelled caller does not cancel the others
+            dfa = await asyncio.shield(future)
+        self.compile_latency.add(time.perf_counter() - start)
+        return key, dfa
+
+
+    def compiled(self, key, future):
+        # Done callback of an in-flight compile: cache the DFA on success, forget the future either way
+        self.inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.automata[key] = future.result()
+        while len(self.automata) > self.max_entries:
+            self.automata.popitem(last=False)
+
+
+    async def match(self, dfa, seq):
+        # Check whether the DFA accepts the sequence; the request joins the next match batch
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((dfa, seq, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self.flush)
+        result = await future
+        self.match_latency.add(time.perf_counter() - start)
+        return result
+
+
+    def flush(self):
+        # Send every queued match request to the executor as a single batch
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self.batches += 1
+        loop = asyncio.get_running_loop()
+        # Matching needs the DFAs themselves, so batches use the loop's default thread pool
+        task = loop.run_in_executor(None, match_batch, [(dfa, seq) for dfa, seq, _ in batch])
+
+        def deliver(done):
+            # Resolve the waiting requests once the batch has run
+            for _, _, future in batch:
+                if future.done():
+                    continue
+                if done.cancelled():
+                    future.cancel()
+                elif done.exception() is not None:
+                    future.set_exception(done.exception())
+            if not done.cancelled() and done.exception() is None:
+                for (_, _, future), result in zip(batch, done.result()):
+                    if not future.done():
+                        future.set_result(result)
+
+        task.add_done_callback(deliver)
+
+
+    async def compile_and_match(self, regex, alphabet, inputs, minimize=False):
+        # Compile (or reuse) the regex and match every input sequence against it
+        _, dfa = await self.compile(regex, alphabet, minimize)
+        return await asyncio.gather(*(self.match(dfa, seq) for seq in inputs))
+
+
+    def metrics(self):
+        # Queue depths, counters and latency summaries (seconds)
+        return {
+            'compile_inflight': len(self.inflight),
+            'match_queue_depth': len(self.pending),
+            'compiles': self.compiles,
+            'coalesced': self.coalesced,
+            'cache_hits': self.cache_hits,
+            'cached_automata': len(self.automata),
+            'match_batches': self.batches,
+            'compile_latency': self.compile_latency.as_dict(),
+            'match_latency': self.match_latency.as_dict(),
+        }
+
+
+    async def handle_request(self, request):
+        # Answer one decoded JSON request. Operations: 'compile' (regex, alphabet, minimize),
+        # 'match' (regex, alphabet, minimize and input or inputs) and 'metrics'.
+        response = {'id': request.get('id')}
+        try:
+            op = request.get('op')
+            if op == 'metrics':
+                response['result'] = self.metrics()
+            elif op == 'compile':
+                key, dfa = await self.compile(request['regex'], request['alphabet'], request.get('minimize', False))
+                response['result'] = {'key': key, 'states': dfa.num_states}
+            elif op == 'match':
+                inputs = request['inputs'] if 'inputs' in request else [request['input']]
+                results = await self.compile_and_match(request['regex'], request['alphabet'], inputs,
+                                                       request.get('minimize', False))
+                response['result'] = results if 'inputs' in request else results[0]
+            else:
+                raise ValueError(f"Unknown operation: {op}")
+        except (LexerError, ParserError) as e:
+            response['error'] = {'type': type(e).__name__, 'message': e.message, 'position': e.position}
+        except (KeyError, TypeError, ValueError) as e:
+            response['error'] = {'type': 'InputError', 'message': f"Invalid request: {e}", 'position': None}
+        except Exception as e:
+            response['error'] = {'type': type(e).__name__, 'message': str(e), 'position': None}
+        return response
+
+
+    async def handle_connection(self, reader, writer):
+        # Serve JSON Lines requests on one connection. Requests are handled concurrently, so responses
+        # can come back out of order; each carries the id of its request.
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                response = {'id': None, 'error': {'type': 'InputError', 'message': f"Invalid request: {e}", 'position': None}}
+            else:
+                response = await self.handle_request(request)
+            async with lock:
+                writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+
+async def serve(service, path=None, host='127.0.0.1', port=0):
+    # Start serving the JSON Lines protocol on a Unix socket (path) or a TCP socket and return the server
+    if path is not None:
+        return await asyncio.start_unix_server(service.handle_connection, path=path)
+    return await asyncio.start_server(service.handle_connection, host=host, port=port)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Serve regex compile and match requests as JSON Lines over a socket.")
+    arg_parser.add_argument('--unix', help="path of the Unix socket to listen on")
+    arg_parser.add_argument('--host', default='127.0.0.1', help="TCP host (ignored with --unix)")
+    arg_parser.add_argument('--port', type=int, default=8765, help="TCP port (ignored with --unix)")
+    arg_parser.add_argument('-j', '--workers', type=int, default=None, help="compile worker processes (default: CPU count)")
+    arg_parser.add_argument('--max-entries', type=int, default=256, help="compiled automata kept in memory")
+    args = arg_parser.parse_args(argv)
+
+    async def run():
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            service = RegexService(executor, max_entries=args.max_entries)
+            server = await serve(service, args.unix, args.host, args.port)
+            async with server:
+                print(f"Listening on {args.unix or f'{args.host}:{args.port}'}", file=sys.stderr)
+                await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    err_code = main()
+    sys.exit(err_code)
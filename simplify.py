@@ -0,0 +1,236 @@
+from collections import deque
+
+from astnode import ASTNode, leaves, postorder
+
+
+class Simplifier:
+    def __init__(self):
+        # Rewrite an AST into a smaller one accepting the same language. Every node built or kept
+        # gets a structural id: two subtrees have the same id exactly when they are identical, so
+        # comparing subtrees is a single integer comparison. Input nodes are reused at most once,
+        # so no node ends up shared and positions can still be assigned to every leaf.
+        self.ids = {}  # Structural key -> id
+        self.id_of = {}  # id(node) -> structural id
+        self.nullable = {}  # Structural id -> whether the subtree accepts the empty sequence
+
+
+    def register(self, node, key, nullable):
+        # Record the structural id and nullability of a node and return the node
+        node_id = self.ids.setdefault(key, len(self.ids))
+        self.id_of[id(node)] = node_id
+        self.nullable[node_id] = nullable
+        return node
+
+
+    def key(self, node):
+        # Return the structural id of an already registered node
+        return self.id_of[id(node)]
+
+
+    def is_nullable(self, node):
+        return self.nullable[self.key(node)]
+
+
+    def simplify(self, root):
+        # Simplify the tree bottom-up (O(n * k) time complexity, where k is the width of the widest union).
+        # A chain of CONCAT (or UNION) nodes is collected into one deque of factors (alternatives) and
+        # only rebuilt at the top of the chain, so long chains are not flattened over and over.
+        results = {}  # id(original node) -> simplified node or ('CONCAT'|'UNION', parts), until its parent takes it
+        for node in postorder(root):
+            if node.type == 'SYMBOL' or node.type == 'CLASS':
+                result = self.register(node, (node.type, node.value), False)
+            elif node.type == 'EPSILON':
+                result = self.register(node, ('EPSILON',), True)
+            elif node.type == 'STAR':
+                result = self.make_star(self.finish(results.pop(id(node.left))))
+            elif node.type == 'CONCAT' or node.type == 'UNION':
+                left = self.pending(results.pop(id(node.left)), node.type)
+                right = self.pending(results.pop(id(node.right)), node.type)
+                # Merge the shorter part into the longer one
+                if len(left) >= len(right):
+                    left.extend(right)
+                    result = (node.type, left)
+                else:
+                    right.extendleft(reversed(left))
+                    result = (node.type, right)
+            else:
+                raise ValueError(f"Unknown node type: {node.type}")
+            results[id(node)] = result
+        return self.finish(results[id(root)])
+
+
+    def pending(self, result, type):
+        # Return the factors (for CONCAT) or alternatives (for UNION) of a child's result as a deque
+        if isinstance(result, tuple):
+            if result[0] == type:
+                return result[1]
+            result = self.finish(result)
+        return deque(self.factors(result) if type == 'CONCAT' else self.alternatives(result))
+
+
+    def finish(self, result):
+        # Build the simplified node for an unfinished chain
+        if isinstance(result, tuple):
+            type, parts = result
+            return self.make_concat(list(parts)) if type == 'CONCAT' else self.make_union(list(parts))
+        return result
+
+
+    def factors(self, node):
+        # Flatten a chain of CONCAT nodes into its factors, left to right
+        if node.type != 'CONCAT':
+            return [node]
+        result = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.type == 'CONCAT':
+                stack.append(node.right)
+                stack.append(node.left)
+            else:
+                result.append(node)
+        return result
+
+
+    def alternatives(self, node):
+        # Flatten a chain of UNION nodes into its alternatives, left to right
+        if node.type != 'UNION':
+            return [node]
+        result = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.type == 'UNION':
+                stack.append(node.right)
+                stack.append(node.left)
+            else:
+                result.append(node)
+        return result
+
+
+    def make_star(self, body):
+        # x** = x*, $* = $, (x + $)* = x* and (x* + y)* = (x + y)*
+        parts = []
+        stack = self.alternatives(body)[::-1]
+        while stack:
+            alternative = stack.pop()
+            if alternative.type == 'STAR':
+                stack.extend(self.alternatives(alternative.left)[::-1])
+            elif alternative.type != 'EPSILON':
+                parts.append(alternative)
+        if not parts:
+            return self.register(ASTNode('EPSILON'), ('EPSILON',), True)
+        body = self.make_union(parts)
+        node = ASTNode('STAR', left=body)
+        return self.register(node, ('STAR', self.key(body)), True)
+
+
+    def make_concat(self, factors):
+        # Flatten CONCAT factors, drop $ factors and merge x*x* into x*, then rebuild a left-deep
+        # CONCAT chain, so equal factor sequences always give the same tree
+        kept = []
+        for factor in (part for factor in factors for part in self.factors(factor)):
+            if factor.type == 'EPSILON':
+                continue
+            if kept and factor.type == 'STAR' and kept[-1].type == 'STAR' and self.key(factor) == self.key(kept[-1]):
+                continue
+            kept.append(factor)
+        if not kept:
+            return self.register(ASTNode('EPSILON'), ('EPSILON',), True)
+        node = kept[0]
+        for factor in kept[1:]:
+            left = node
+            node = ASTNode('CONCAT', left=left, right=factor)
+            self.register(node, ('CONCAT', self.key(left), self.key(factor)),
+                          self.is_nullable(left) and self.is_nullable(factor))
+        return node
+
+
+    def make_union(self, alternatives):
+        # Remove duplicate alternatives, drop $ when another alternative is nullable and factor
+        # common prefixes out of alternatives: xy + xz = x(y + z). Alternatives keep their order.
+        # Prefixes are factored over index ranges into the flattened factor lists, walking the trie
+        # of factors with an explicit stack: a frame holds the alternatives sharing the factors
+        # before depth (O(total number of factors) time complexity).
+        # Duplicates are found by their factor keys, the same keys the grouping below compares
+        unique = []
+        factors = []
+        keys = []
+        seen = set()
+        for alternative in alternatives:
+            parts = [] if alternative.type == 'EPSILON' else self.factors(alternative)
+            key = tuple(self.key(factor) for factor in parts)
+            if key not in seen:
+                seen.add(key)
+                unique.append(alternative)
+                factors.append(parts)
+                keys.append(key)
+        # nullable_from[i][depth]: whether factors[i][depth:] accepts the empty sequence
+        nullable_from = []
+        for parts in factors:
+            flags = [True] * (len(parts) + 1)
+            for depth in range(len(parts) - 1, -1, -1):
+                flags[depth] = flags[depth + 1] and self.is_nullable(parts[depth])
+            nullable_from.append(flags)
+
+        def open_frame(members, depth):
+            # Drop the empty rest when another rest is nullable, then group the members by their next factor
+            if len(members) > 1 and any(nullable_from[i][depth] for i in members if depth < len(factors[i])):
+                members = [i for i in members if depth < len(factors[i])]
+            groups = {}
+            for i in members:
+                groups.setdefault(keys[i][depth] if depth < len(keys[i]) else None, []).append(i)
+            return {'depth': depth, 'groups': list(groups.values()), 'next': 0, 'parts': [], 'prefix': None}
+
+        stack = [open_frame(list(range(len(unique))), 0)]
+        result = None
+        while True:
+            frame = stack[-1]
+            depth = frame['depth']
+            if result is not None:
+                # The union of the rests after this frame's pending prefix is done
+                frame['parts'].append(self.make_concat(frame['prefix'] + [result]))
+                result = None
+            if frame['next'] == len(frame['groups']):
+                stack.pop()
+                result = self.join_union(frame['parts'])
+                if not stack:
+                    return result
+                continue
+            group = frame['groups'][frame['next']]
+            frame['next'] += 1
+            if len(group) == 1 or depth == len(factors[group[0]]):
+                # A single member, or members without factors left, which all stand for $
+                i = group[0]
+                frame['parts'].append(unique[i] if depth == 0 else self.make_concat(factors[i][depth:]))
+                continue
+            # Length of the prefix shared by every member of the group
+            length = 1
+            shortest = min(len(factors[i]) for i in group) - depth
+            while length < shortest and len({keys[i][depth + length] for i in group}) == 1:
+                length += 1
+            frame['prefix'] = factors[group[0]][depth:depth + length]
+            stack.append(open_frame(group, depth + length))
+
+
+    def join_union(self, parts):
+        # Rebuild a left-deep UNION chain over the parts
+        node = parts[0]
+        for part in parts[1:]:
+            left = node
+            node = ASTNode('UNION', left=left, right=part)
+            self.register(node, ('UNION', self.key(left), self.key(part)),
+                          self.is_nullable(left) or self.is_nullable(part))
+        return node
+
+
+def count_positions(node):
+    # Count the leaves that will receive a position
+    return sum(1 for _ in leaves(node))
+
+
+def simplify_ast(ast):
+    # Return a simplified AST accepting the same language and the number of positions removed.
+    # Must run before positions are assigned.
+    simplified = Simplifier().simplify(ast)
+    return simplified, count_positions(ast) - count_positions(simplified)
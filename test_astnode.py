@@ -0,0 +1,31 @@
+import sys
+
+from astnode import *
+from compiler import compile
+from lexer import Lexer
+from parse import Parser
+
+
+def test_traversal_order():
+    parser = Parser(Lexer('(a+b)*c', {'a', 'b', 'c'}))
+    ast = parser.parse()
+    assert [node.type for node in postorder(ast)] == ['SYMBOL', 'SYMBOL', 'UNION', 'STAR', 'SYMBOL', 'CONCAT', 'SYMBOL', 'CONCAT']
+    assert [(node.type, depth) for node, depth in preorder(ast)][:4] == [('CONCAT', 0), ('CONCAT', 1), ('STAR', 2), ('UNION', 3)]
+    assert [leaf.value for leaf in leaves(ast)] == ['a', 'b', 'c', '#']
+
+
+def test_compact_nodes():
+    node = ASTNode('SYMBOL', value=''.join(['x', '1']))
+    assert not hasattr(node, '__dict__')
+    assert node.value is sys.intern('x1')
+    star = ASTNode('STAR', value=node)
+    assert star.left is node and star.value is None
+
+
+def test_deep_tree_without_recursion():
+    depth = sys.getrecursionlimit() * 3
+    compiled = compile('ab' * depth, {'a', 'b'}, engine='glushkov')
+    assert len(compiled.followpos_table) == 2 * depth + 1
+    assert 'dfa' not in compiled.__dict__
+    assert compiled.fullmatch('ab' * depth)
+    assert not compiled.fullmatch('ab' * (depth - 1))
@@ -0,0 +1,53 @@
+import io
+import json
+
+from batch import compile_batch, main, read_entries
+from dfa import DFA
+
+def test_read_entries():
+    source = io.StringIO('\n'.join([
+        '{"id": "x", "regex": "a*", "alphabet": ["a"]}',
+        '# comment',
+        '(ab)*\ta b',
+        '{"regex": "a"',
+    ]))
+    entries = list(read_entries(source))
+    assert entries[0] == {'id': 'x', 'regex': 'a*', 'alphabet': ['a']}
+    assert entries[1] == {'id': 3, 'regex': '(ab)*', 'alphabet': ['a', 'b']}
+    assert entries[2]['error']['type'] == 'InputError'
+
+def test_compile_batch_reports_errors_per_item():
+    entries = [
+        {'id': 1, 'regex': '(a+b)*abb', 'alphabet': ['a', 'b']},
+        {'id': 2, 'regex': 'ac', 'alphabet': ['a', 'b']},
+        {'id': 3, 'regex': 'a(b+', 'alphabet': ['a', 'b']},
+        {'id': 4, 'regex': 'b*', 'alphabet': ['a', 'b']},
+    ]
+    results = list(compile_batch(entries, workers=2, chunk_size=1))
+
+    assert [result['id'] for result in results] == [1, 2, 3, 4]
+    assert DFA.from_dict(results[0]['dfa']).fullmatch('aabb')
+    assert results[1]['error']['type'] == 'LexerError'
+    assert results[2]['error']['type'] == 'ParserError'
+    assert results[2]['error']['position'] == 4
+    assert DFA.from_dict(results[3]['dfa']).fullmatch('bbb')
+
+def test_compile_batch_timeout():
+    entries = [
+        {'id': 1, 'regex': '(a+b)*a(a+b){16}', 'alphabet': ['a', 'b']},
+        {'id': 2, 'regex': 'a', 'alphabet': ['a']},
+    ]
+    results = list(compile_batch(entries, workers=1, timeout=0.05))
+    assert results[0]['error']['type'] == 'Timeout'
+    assert 'dfa' in results[1]
+
+def test_main(tmp_path, capsys):
+    source = tmp_path / 'rules.jsonl'
+    source.write_text('{"regex": "ab", "alphabet": ["a", "b"]}\n{"regex": "ab", "alphabet": ["a"]}\n')
+    output = tmp_path / 'out.jsonl'
+
+    assert main([str(source), '-o', str(output), '-j', '1', '--minimize']) == 1
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert results[0]['dfa']['start_state'] == 'q0'
+    assert results[1]['error']['type'] == 'LexerError'
+    assert 'Compiled 1 of 2 patterns' in capsys.readouterr().err
@@ -0,0 +1,31 @@
+from bench import STAGES, compare, match_input, run_workload, workloads
+from dfa import DFAConstructor
+from lexer import Lexer
+
+def test_run_workload():
+    name, regex, alphabet = workloads(quick=True)[0]
+    result = run_workload(name, regex, alphabet, min_time=0.001)
+    assert set(result['ops']) == set(STAGES)
+    assert all(value > 0 for value in result['ops'].values())
+    assert result['positions'] == 13
+    assert result['states'] == 10
+    assert result['peak_memory'] > 0
+
+def test_compare():
+    baseline = [{'name': 'w', 'ops': {'parse': 100.0, 'match': 100.0}}]
+    results = [{'name': 'w', 'ops': {'parse': 80.0, 'match': 60.0}}, {'name': 'new', 'ops': {'parse': 1.0}}]
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('w match')
+
+def test_match_input_is_accepted():
+    for name, regex, alphabet in workloads(quick=True):
+        dfa_constructor = DFAConstructor(Lexer(regex, alphabet))
+        dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+        seq = match_input(dfa, length=100)
+        assert dfa.fullmatch(seq), name
+        # Finite languages get their longest word; accepted lengths of (ab...)* are multiples of 40
+        expected = {'length-4': 8, 'length-16': 32, 'bounds-4': 5, 'bounds-16': 17}.get(name, 100)
+        if name.startswith('symbol-length'):
+            expected = 80
+        assert len(seq) == expected, name
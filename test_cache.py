@@ -0,0 +1,61 @@
+import threading
+
+from cache import RegexCache, cache_key
+
+def test_cache_hits_and_misses():
+    cache = RegexCache()
+    first = cache.get('(a+b)*abb', {'a', 'b'})
+    second = cache.get('(a+b)*abb', {'b', 'a'})
+
+    assert first is second
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['memory'] > 0
+    assert cache.get('(a+b)*abb', {'a', 'b'}, minimize=True) is not first
+
+def test_cache_key_is_canonical():
+    alphabet = {'a', 'b'}
+    key = cache_key('ab', alphabet)
+    cache = RegexCache()
+    cache.get('ab', alphabet)
+
+    assert alphabet == {'a', 'b'}
+    assert cache_key('ab', alphabet) == key
+    assert cache_key('ab', ['b', 'a', '$']) == key
+    assert cache_key('ab', {'a', 'b', 'c'}) != key
+    assert cache_key('a', {'ba'}) != cache_key('ab', {'a'})
+
+def test_cache_eviction():
+    cache = RegexCache(max_entries=2)
+    a = cache.get('a', {'a', 'b'})
+    cache.get('b', {'a', 'b'})
+    cache.get('a', {'a', 'b'})
+    cache.get('ab', {'a', 'b'})
+
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['entries'] == 2
+    assert cache.get('a', {'a', 'b'}) is a
+
+    small = RegexCache(max_memory=1)
+    small.get('a', {'a'})
+    small.get('aa', {'a'})
+    assert small.stats()['entries'] == 1
+
+def test_cache_is_thread_safe():
+    cache = RegexCache()
+    results = []
+
+    def worker():
+        for _ in range(20):
+            results.append(cache.get('(a+b)*a', {'a', 'b'}))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(result) for result in results}) == 1
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 80
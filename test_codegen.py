@@ -0,0 +1,57 @@
+import itertools
+import random
+
+from codegen import load_module
+from compiler import compile
+
+
+def test_generated_matcher_agrees_with_table():
+    alphabet = {'a', 'b', 'c', 'd'}
+    for regex in ['(a+b)*c[^ab]{1,2}', '(ab+c)*', 'a*', '$', 'a{2,3}(b+c+d)*']:
+        dfa = compile(regex, alphabet).dfa
+        namespace = {}
+        exec(dfa.to_python_source(), namespace)
+        for length in range(5):
+            for seq in itertools.product(sorted(alphabet), repeat=length):
+                assert namespace['fullmatch'](seq) == dfa.fullmatch(seq)
+                assert namespace['match_prefix'](seq) == dfa.match_prefix(seq)
+        assert not namespace['fullmatch'](['x'])
+
+
+def test_dict_dispatch_for_many_targets():
+    alphabet = {f'x{i}' for i in range(12)}
+    dfa = compile('(' + '+'.join(f'x{i}x{i}' for i in range(12)) + ')*', alphabet).dfa
+    source = dfa.to_python_source(max_branches=4)
+    assert '.get(symbol)' in source
+    namespace = {}
+    exec(source, namespace)
+    assert namespace['fullmatch'](['x3', 'x3', 'x11', 'x11'])
+    assert not namespace['fullmatch'](['x3', 'x4'])
+    assert namespace['match_prefix'](['x3', 'x3', 'x5']) == 2
+
+
+def test_generated_matcher_is_state_independent():
+    # 256 states: a step must not depend on the number of states
+    alphabet = {'a', 'b', 'c'}
+    dfa = compile('(a+b+c)*a(a+b+c){7}', alphabet).dfa
+    assert dfa.num_states == 256
+    source = dfa.to_python_source()
+    assert 'state ==' not in source
+    namespace = {}
+    exec(source, namespace)
+    rng = random.Random(0)
+    for _ in range(200):
+        seq = ''.join(rng.choice('abc') for _ in range(rng.randrange(12)))
+        assert namespace['fullmatch'](seq) == dfa.fullmatch(seq)
+        assert namespace['match_prefix'](seq) == dfa.match_prefix(seq)
+
+
+def test_write_and_import_module(tmp_path):
+    dfa = compile('(a+b)*abb', {'a', 'b'}, minimize=True).dfa
+    path = dfa.write_python_module(str(tmp_path / 'abb_matcher.py'))
+    module = load_module(path)
+    assert module.__name__ == 'abb_matcher'
+    assert module.fullmatch('aababb')
+    assert not module.fullmatch('abba')
+    assert module.match_prefix('abbab') == 3
+    assert module.ACCEPT and set(module.TAGS.values()) == {0}
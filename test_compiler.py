@@ -0,0 +1,68 @@
+import logging
+
+from compiler import CompiledRegex, compile
+from dfa import DFAConstructor
+from instrument import CallbackTracer
+
+def test_compile_runs_each_stage_once(monkeypatch):
+    calls = []
+    construct_dfa = DFAConstructor.construct_dfa
+    followpos = DFAConstructor.followpos
+    monkeypatch.setattr(DFAConstructor, 'construct_dfa', lambda self, *args, **kwargs: calls.append('dfa') or construct_dfa(self, *args, **kwargs))
+    monkeypatch.setattr(DFAConstructor, 'followpos', lambda self, *args: calls.append('followpos') or followpos(self, *args))
+
+    compiled = compile('(a+b)*abb', {'a', 'b'})
+    assert compiled.dfa is compiled.dfa
+    assert compiled.lexer.processed_regex == '(a+b)*.a.b.b'
+    assert compiled.ast.firstpos == {1, 2, 3}
+    assert compiled.followpos_table[3] == {4}
+    assert compiled.fullmatch('ababb')
+    assert not compiled.fullmatch('abab')
+    assert compiled.match_prefix('abbab') == 3
+    assert calls == ['followpos', 'dfa']
+
+def test_compile_is_silent(capsys):
+    compile('(a+b)*abb', {'a', 'b'})
+    assert capsys.readouterr().out == ''
+
+def test_compile_debug_logging(caplog):
+    with caplog.at_level(logging.DEBUG):
+        compile('ab', {'a', 'b'})
+    messages = '\n'.join(record.getMessage() for record in caplog.records)
+    assert 'Processed regex: a.b' in messages
+    assert 'AST:' in messages
+    assert 'DFA:' in messages
+
+def test_compiled_regex_is_lazy():
+    compiled = CompiledRegex('a*', {'a'})
+    assert 'dfa' not in compiled.__dict__
+    assert compiled.lexer.processed_regex == 'a*'
+    assert 'constructor' not in compiled.__dict__
+    assert compiled.fullmatch('aaa')
+    assert 'dfa' in compiled.__dict__
+
+def test_compile_does_not_modify_alphabet():
+    alphabet = {'a', 'b'}
+    compile('a+b', alphabet)
+    assert alphabet == {'a', 'b'}
+
+def test_compile_stats_and_tracer():
+    events = []
+    tracer = CallbackTracer(on_start=lambda phase: events.append(('start', phase)),
+                            on_end=lambda phase, elapsed: events.append(('end', phase)))
+    compiled = compile('(a+b)*abb', {'a', 'b', 'c'}, minimize=True, tracer=tracer)
+    stats = compiled.stats
+
+    assert list(stats.phase_times) == ['lex', 'parse', 'simplify', 'positions', 'followpos', 'subset', 'minimize']
+    assert all(elapsed >= 0 for elapsed in stats.phase_times.values())
+    assert events[:2] == [('start', 'lex'), ('end', 'lex')]
+    assert [event for event in events if event[0] == 'end'] == [('end', phase) for phase in stats.phase_times]
+    assert stats.tokens == 12
+    assert stats.ast_nodes == 12
+    assert stats.positions == 6
+    assert stats.positions_removed == 0
+    assert stats.dfa_states == 5
+    assert stats.transitions == 15
+    assert stats.dead_transitions == 7
+    assert stats.max_followpos == 3
+    assert stats.as_dict()['dfa_states'] == 5
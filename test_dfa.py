@@ -1,3 +1,6 @@
+import itertools
+import sys
+
 from dfa import *
 from lexer import *
 from parse import *
@@ -45,4 +48,292 @@ def test_simple_regex_3():
         'q0': {'a': 'q1', 'b': 'q1', 'c': 'q1'},
         'q1': {'a': 'q1', 'b': 'q1', 'c': 'q1'},
         'q2': {'a': 'q2', 'b': 'q0', 'c': 'q1'}
-    }
\ No newline at end of file
+    }
+    
+def test_annotate_positions():
+    alphabet = {'a', 'b', 'c'}
+    regex = 'a*b'
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    ast = dfa_constructor.ast
+
+    assert ast.nullable is False
+    assert ast.firstpos == {1, 2}
+    assert ast.lastpos == {3}
+    assert ast.left.left.nullable is True
+    assert dfa_constructor.followpos_table == {1: {1, 2}, 2: {3}, 3: set()}
+
+    
+def test_bitset_construction_matches_set_construction():
+    alphabet = {'a', 'b', 'c'}
+    for regex in ['a', 'a+b', 'a*b', '(a+b)*abb', '(abc+((ab*+c+b*)))(abc+((ab*+$+b*)))**+c*', 'a{2,4}b']:
+        lexer = Lexer(regex, set(alphabet))
+        dfa_constructor = DFAConstructor(lexer)
+        fast = dfa_constructor.construct_dfa(dfa_constructor.ast, bitset=True)
+        slow = dfa_constructor.construct_dfa(dfa_constructor.ast, bitset=False)
+
+        assert fast.start_state == slow.start_state
+        assert fast.accept_states == slow.accept_states
+        assert fast.transitions == slow.transitions
+
+
+def test_construction_choice_for_wide_patterns():
+    # 1201 positions but states of one position: the set construction is cheaper
+    sparse = DFAConstructor(Lexer('(ab){600}', {'a', 'b'}))
+    assert sparse.prefer_bitset(sparse.ast.firstpos, ['a', 'b'], sparse.followpos_table,
+                                {leaf.position: leaf for leaf in leaves(sparse.ast)}) is False
+    # States with many positions keep the bitset construction
+    dense = DFAConstructor(Lexer('(a+b)*a(a+b){8}(ab){600}', {'a', 'b'}))
+    assert dense.prefer_bitset(dense.ast.firstpos, ['a', 'b'], dense.followpos_table,
+                               {leaf.position: leaf for leaf in leaves(dense.ast)}) is True
+    dfa = sparse.construct_dfa(sparse.ast)
+    assert dfa.num_states == 1202
+    assert dfa.transitions == sparse.construct_dfa(sparse.ast, bitset=True).transitions
+    assert dfa.fullmatch('ab' * 600)
+
+    
+def accepts(dfa, word):
+    state = dfa.start_state
+    for symbol in word:
+        state = dfa.transitions[state][symbol]
+    return state in dfa.accept_states
+
+
+def test_minimize():
+    alphabet = {'a', 'b'}
+    regex = '(a+ab)(a+b)*+a*b*+ab'
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+    minimal = dfa_constructor.construct_dfa(dfa_constructor.ast, minimize=True)
+
+    assert len(minimal.transitions) < len(dfa.transitions)
+    assert minimal.start_state == 'q0'
+    assert len(minimal.minimize().transitions) == len(minimal.transitions)
+    words = [''] + [w for n in range(1, 8) for w in map(''.join, itertools.product('ab', repeat=n))]
+    for word in words:
+        assert accepts(minimal, word) == accepts(dfa, word)
+        
+        
+def test_minimize_merges_dead_states_and_drops_unreachable():
+    dfa = DFA('s', {'t'}, {
+        's': {'a': 't', 'b': 'd1'},
+        't': {'a': 'd2'},
+        'd1': {'a': 'd2', 'b': 'd1'},
+        'd2': {'a': 'd1', 'b': 'd2'},
+        'u': {'a': 's', 'b': 's'},
+    })
+    minimal = dfa.minimize()
+
+    assert minimal.start_state == 'q0'
+    assert minimal.accept_states == {'q1'}
+    assert minimal.transitions == {
+        'q0': {'a': 'q1', 'b': 'q2'},
+        'q1': {'a': 'q2', 'b': 'q2'},
+        'q2': {'a': 'q2', 'b': 'q2'},
+    }
+
+
+def test_compiled_matching():
+    alphabet = {'a', 'b', 'c'}
+    regex = '(a+b)*abb'
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+    compiled = dfa.compile()
+
+    assert compiled is dfa.compile()
+    assert compiled.num_states == len(dfa.transitions)
+    assert dfa.fullmatch('abb')
+    assert dfa.fullmatch('babaabb')
+    assert not dfa.fullmatch('')
+    assert not dfa.fullmatch('abbc')
+    assert not dfa.fullmatch('abd')
+    assert dfa.match_prefix('abbabbc') == 6
+    assert dfa.match_prefix('abbab') == 3
+    assert dfa.match_prefix('cabb') is None
+    for n in range(6):
+        for word in map(''.join, itertools.product('abc', repeat=n)):
+            assert dfa.fullmatch(word) == accepts(dfa, word)
+
+
+def count_symbols(node):
+    if node is None:
+        return 0
+    if node.type == 'SYMBOL':
+        return 1
+    if node.type == 'STAR':
+        return count_symbols(node.left)
+    return count_symbols(node.left) + count_symbols(node.right)
+
+
+def test_counted_repetition_is_linear():
+    alphabet = {'a', 'b'}
+    lexer = Lexer('a{1,200}', alphabet)
+    parser = Parser(lexer)
+    ast = parser.parse()
+
+    assert count_symbols(ast) == 201
+
+    lexer = Lexer('(ab){3,150}', alphabet)
+    parser = Parser(lexer)
+    ast = parser.parse()
+
+    assert count_symbols(ast) == 301
+
+
+def test_counted_repetition_language():
+    alphabet = {'a', 'b'}
+    cases = {
+        'a{2,4}': lambda w: set(w) <= {'a'} and 2 <= len(w) <= 4,
+        '(ab){1,3}': lambda w: w in {'ab', 'abab', 'ababab'},
+        '(a+$){2}': lambda w: w in {'', 'a', 'aa'},
+        '(a+$b){1,2}': lambda w: w in {'a', 'b', 'aa', 'ab', 'ba', 'bb'},
+        'b(a*b){2,}': lambda w: w.startswith('b') and w.count('b') >= 3 and w.endswith('b'),
+    }
+    for regex, expected in cases.items():
+        lexer = Lexer(regex, set(alphabet))
+        dfa_constructor = DFAConstructor(lexer)
+        dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+        for n in range(8):
+            for word in map(''.join, itertools.product('ab', repeat=n)):
+                assert dfa.fullmatch(word) == expected(word), (regex, word)
+
+
+def test_parser_error_position():
+    lexer = Lexer('a(b+)', {'a', 'b'})
+    parser = Parser(lexer)
+    try:
+        parser.parse()
+    except ParserError as e:
+        assert e.position == 4
+        assert e.message == 'Unexpected character: )'
+    else:
+        assert False
+
+
+def test_compact_rows_for_large_alphabet():
+    alphabet = {f'x{i}' for i in range(200)}
+    lexer = Lexer('x1x2*x3', alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+
+    assert dfa.num_states == 4
+    assert all(type(row) is tuple for row in dfa.rows)
+    assert sum(len(row[0]) for row in dfa.rows) == 3
+    assert dfa.transitions[dfa.state_name(dfa.dead)] == {symbol: dfa.state_name(dfa.dead) for symbol in sorted(alphabet)}
+    assert len(dfa.transitions[dfa.start_state]) == 200
+    assert dfa.fullmatch(['x1', 'x2', 'x2', 'x3'])
+    assert not dfa.fullmatch(['x1', 'x4'])
+    full_size = sum(sys.getsizeof(dict(trans)) for trans in dfa.transitions.values())
+    assert dfa.memory_size() * 4 < full_size
+
+
+def test_transitions_view_round_trip():
+    dfa = DFA('s', {'t'}, {
+        's': {'a': 't', 'b': 's'},
+        't': {'a': 't'},
+    }, {'t': 3})
+
+    assert dfa.start_state == 's'
+    assert dfa.accept_states == {'t'}
+    assert dfa.accept_tags == {'t': 3}
+    assert dict(dfa.transitions) == {'s': {'a': 't', 'b': 's'}, 't': {'a': 't'}}
+    assert dfa.dead is None
+    assert not dfa.fullmatch('ab')
+    assert DFA.from_dict(dfa.to_dict()).transitions == dfa.transitions
+
+
+def test_symbol_classes_for_large_alphabet():
+    alphabet = {f's{i}' for i in range(1000)}
+    used = [f's{i}' for i in range(10)]
+    regex = '(' + '+'.join(used[:5]) + ')*' + ''.join(used[5:])
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+
+    # Each used symbol labels its own position; the 990 unused symbols share one class
+    assert dfa.num_classes == 11
+    assert len(set(dfa.symbol_index.values())) == 11
+    assert dfa.compile().width == 11
+    assert dfa.symbol_index['s500'] == dfa.symbol_index['s999']
+    assert dfa.transitions == dfa_constructor.construct_dfa(dfa_constructor.ast, bitset=False).transitions
+    assert len(dfa.transitions[dfa.start_state]) == 1000
+    assert dfa.fullmatch(['s0', 's4', 's2'] + used[5:])
+    assert not dfa.fullmatch(['s0', 's500'] + used[5:])
+    assert dfa.minimize().num_classes == 11
+
+
+def test_character_class_takes_one_position():
+    alphabet = {f's{i:02}' for i in range(60)}
+    members = sorted(alphabet)[:50]
+    class_constructor = DFAConstructor(Lexer('[s00-s49]*s55', alphabet))
+    union_constructor = DFAConstructor(Lexer('(' + '+'.join(members) + ')*s55', alphabet))
+    class_dfa = class_constructor.construct_dfa(class_constructor.ast)
+    union_dfa = union_constructor.construct_dfa(union_constructor.ast)
+
+    assert len(class_constructor.followpos_table) == 3
+    assert len(union_constructor.followpos_table) == 52
+    assert class_dfa.equivalent(union_dfa) == (True, None)
+    assert class_dfa.num_classes == 3
+    assert class_dfa.fullmatch(['s03', 's49', 's55'])
+    assert not class_dfa.fullmatch(['s50', 's55'])
+
+    negated_constructor = DFAConstructor(Lexer('[^s00-s49]{2}', alphabet))
+    negated_dfa = negated_constructor.construct_dfa(negated_constructor.ast)
+    assert negated_dfa.fullmatch(['s50', 's59'])
+    assert not negated_dfa.fullmatch(['s50', 's00'])
+    assert negated_dfa.transitions == negated_constructor.construct_dfa(negated_constructor.ast, bitset=False).transitions
+
+
+def build(regex, alphabet):
+    dfa_constructor = DFAConstructor(Lexer(regex, alphabet))
+    return dfa_constructor.construct_dfa(dfa_constructor.ast)
+
+
+def test_equivalent():
+    alphabet = {'a', 'b', 'c'}
+    assert build('(a+b)*', alphabet).equivalent(build('(a*b*)*', alphabet)) == (True, None)
+    assert build('a(ba)*', alphabet).equivalent(build('(ab)*a', alphabet).minimize()) == (True, None)
+
+    left, right = build('(a+b)*c', alphabet), build('a*b*c', alphabet)
+    same, counterexample = left.equivalent(right)
+    assert not same
+    assert left.fullmatch(counterexample) != right.fullmatch(counterexample)
+    assert right.equivalent(left)[0] is False
+
+    # Symbols missing from one alphabet lead to that DFA's dead state
+    assert build('a*', {'a'}).equivalent(build('a*', alphabet)) == (True, None)
+    same, counterexample = build('a+b', {'a', 'b'}).equivalent(build('a+c', {'a', 'c'}))
+    assert not same and counterexample in (['b'], ['c'])
+
+
+def test_includes():
+    alphabet = {'a', 'b'}
+    everything, evens = build('(a+b)*', alphabet), build('((a+b)(a+b))*', alphabet)
+    assert everything.includes(evens) == (True, None)
+    assert evens.includes(everything) == (False, ['a'])
+    assert build('a{2,5}', alphabet).includes(build('a{3}', alphabet)) == (True, None)
+    assert build('a{2,5}', alphabet).includes(build('a{3,}', alphabet)) == (False, ['a'] * 6)
+    assert everything.includes(build('$', alphabet)) == (True, None)
+
+
+def test_parser_error_source_position():
+    # 'abc+(ab' is processed into 'a.b.c+(a.b'; the missing ')' is reported at the end of the source
+    try:
+        Parser(Lexer('abc+(ab', {'a', 'b', 'c'})).parse()
+    except ParserError as e:
+        assert e.position == 7
+    else:
+        assert False
+
+
+def test_parser_error_non_numeric_repeat_bound():
+    for regex, position in [('a{2,[b]}', 4), ('a{[b]}', 2)]:
+        try:
+            Parser(Lexer(regex, {'a', 'b'})).parse()
+        except ParserError as e:
+            assert e.position == position
+            assert e.message.startswith('Expected a number')
+        else:
+            assert False
@@ -0,0 +1,90 @@
+import itertools
+
+from compiler import compile
+from dfa import *
+from glushkov import GlushkovMatcher, select_engine
+from lexer import *
+
+
+def test_glushkov_matches_dfa():
+    alphabet = {'a', 'b', 'c'}
+    for regex in ['(a+b)*a(a+b){1,3}c*', '(ab+c)*', '[^c]*c', '$', 'a{2,}']:
+        dfa_constructor = DFAConstructor(Lexer(regex, alphabet))
+        dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+        glushkov = GlushkovMatcher(dfa_constructor)
+        for n in range(6):
+            for word in itertools.product('abc', repeat=n):
+                assert glushkov.fullmatch(word) == dfa.fullmatch(word)
+                assert glushkov.match_prefix(word) == dfa.match_prefix(word)
+        assert not glushkov.fullmatch('x')
+
+
+def test_glushkov_byte_unions_span_bytes():
+    # 40 positions, so the active positions span several bytes
+    alphabet = {'a', 'b'}
+    dfa_constructor = DFAConstructor(Lexer('(ab){19}a*', alphabet))
+    glushkov = GlushkovMatcher(dfa_constructor, max_cached=2)
+    assert glushkov.fullmatch('ab' * 19 + 'aaa')
+    assert not glushkov.fullmatch('ab' * 18)
+    assert glushkov.match_prefix('ab' * 19 + 'ab') == 39
+    assert len(glushkov.byte_unions) <= 2
+
+
+    # Several active positions per byte, with a cache too small to keep every union
+    dfa_constructor = DFAConstructor(Lexer('(a+b)*a(a+b){9}', alphabet))
+    glushkov = GlushkovMatcher(dfa_constructor, max_cached=2)
+    dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+    for n in range(8, 14):
+        for word in itertools.product('ab', repeat=n):
+            assert glushkov.fullmatch(word) == dfa.fullmatch(word)
+    assert 0 < len(glushkov.byte_unions) <= 2
+
+
+def test_select_engine():
+    alphabet = {'a', 'b'}
+    small = DFAConstructor(Lexer('(a+b)*a(a+b){3}', alphabet))
+    assert isinstance(select_engine(small, max_dfa_states=64), DFA)
+
+    # The DFA for this pattern needs 2**12 states, so the probe gives up
+    blowup = DFAConstructor(Lexer('(a+b)*a(a+b){11}', alphabet))
+    matcher = select_engine(blowup, max_dfa_states=64)
+    assert isinstance(matcher, GlushkovMatcher)
+    assert matcher.fullmatch('bba' + 'b' * 11)
+    assert not matcher.fullmatch('b' * 14)
+
+    try:
+        blowup.construct_dfa(blowup.ast, max_states=64)
+    except StateLimitError as e:
+        assert e.limit == 64
+    else:
+        assert False
+
+
+def test_compile_engines():
+    alphabet = {'a', 'b'}
+    compiled = compile('(a+b)*a(a+b){11}', alphabet, engine='auto', max_dfa_states=64)
+    assert isinstance(compiled.matcher, GlushkovMatcher)
+    assert 'glushkov' in compiled.tracer.phase_times
+    assert compiled.fullmatch('a' * 12)
+
+    compiled = compile('(ab)*', alphabet, engine='auto')
+    assert compiled.matcher is compiled.dfa
+    assert isinstance(compile('(ab)*', alphabet, engine='glushkov').matcher, GlushkovMatcher)
+    try:
+        compile('a', alphabet, engine='nfa')
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_glushkov_stats_skip_dfa():
+    # The DFA would have 2**17 states; stats must not build it
+    compiled = compile('(a+b)*a' + '(a+b)' * 16, {'a', 'b'}, engine='auto')
+    stats = compiled.stats
+    assert isinstance(compiled.matcher, GlushkovMatcher)
+    assert 'dfa' not in compiled.__dict__
+    assert stats.positions == 36
+    assert stats.dfa_states is None
+    assert stats.transitions is None
+    assert stats.as_dict()['dead_transitions'] is None
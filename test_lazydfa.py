@@ -0,0 +1,48 @@
+import itertools
+
+from dfa import *
+from lexer import *
+from lazydfa import LazyDFA
+
+def test_lazy_dfa_matches_full_dfa():
+    alphabet = {'a', 'b', 'c'}
+    regex = '(a+b)*a(a+b){1,3}c*'
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    dfa = dfa_constructor.construct_dfa(dfa_constructor.ast)
+    lazy = LazyDFA(dfa_constructor)
+
+    for n in range(7):
+        for word in map(''.join, itertools.product('abc', repeat=n)):
+            assert lazy.fullmatch(word) == dfa.fullmatch(word)
+            assert lazy.match_prefix(word) == dfa.match_prefix(word)
+    assert lazy.cache_info()['states'] <= len(dfa.transitions)
+    assert lazy.cache_info()['hits'] > lazy.cache_info()['misses']
+    assert lazy.cache_info()['evictions'] == 0
+    
+def test_lazy_dfa_eviction():
+    alphabet = {'a', 'b'}
+    regex = '(a+b)*a(a+b)(a+b)(a+b)'
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    lazy = LazyDFA(dfa_constructor, max_states=3)
+
+    assert lazy.fullmatch('babbaaabab')
+    assert not lazy.fullmatch('babbaaabbbb')
+    info = lazy.cache_info()
+    assert info['states'] <= 3
+    assert info['evictions'] > 0
+    assert info['misses'] > 0
+
+    lazy.clear_cache()
+    assert lazy.cache_info() == {'hits': 0, 'misses': 0, 'evictions': 0, 'states': 0, 'memory': 0}
+    
+def test_lazy_dfa_memory_ceiling():
+    alphabet = {'a', 'b'}
+    regex = '(a+b)*a(a+b)(a+b)(a+b)(a+b)'
+    lexer = Lexer(regex, alphabet)
+    dfa_constructor = DFAConstructor(lexer)
+    lazy = LazyDFA(dfa_constructor, max_memory=1000)
+
+    assert lazy.fullmatch('abababababbbbabaaabb')
+    assert lazy.cache_info()['memory'] <= 1000
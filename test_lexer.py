@@ -1,4 +1,4 @@
-from lexer import Lexer
+from lexer import Lexer, LexerError
 
 def test_lexer_1():
     string = "a+b"
@@ -153,4 +153,82 @@ def test_lexer_11():
     assert lexer.next().value == "a"
     assert lexer.next().value == "."
     assert lexer.next().value == "+"
-    assert lexer.next().value == "EOF"
\ No newline at end of file
+    assert lexer.next().value == "EOF"
+
+def test_lexer_multi_character_symbols():
+    string = "abcab"
+    alphabet = {"ab", "c", "a"}
+    lexer = Lexer(string, alphabet)
+    assert lexer.processed_regex == "ab.c.ab"
+    assert lexer.get_symbol_list("abaab") == ["ab", "a", "ab"]
+    assert lexer.trie is Lexer("c", {"c", "a", "ab"}).trie
+    
+def test_lexer_ambiguous_string():
+    alphabet = {"a", "b", "ab"}
+    try:
+        Lexer("ab", alphabet)
+    except LexerError as e:
+        assert "more than one way" in e.message
+    else:
+        assert False
+    try:
+        Lexer("ac", alphabet)
+    except LexerError as e:
+        assert "cannot be formed" in e.message
+    else:
+        assert False
+    
+def test_lexer_token_stream():
+    string = "ab*{2,3}"
+    alphabet = {"ab"}
+    lexer = Lexer(string, alphabet)
+    assert isinstance(lexer.tokens, tuple)
+    assert [(token.type, token.value, token.position) for token in lexer.tokens] == [
+        ("SYMBOL", "ab", 0),
+        ("OPERATOR", "*", 2),
+        ("OPERATOR", "{", 3),
+        ("NUMBER", "2", 4),
+        ("OPERATOR", ",", 5),
+        ("NUMBER", "3", 6),
+        ("OPERATOR", "}", 7),
+        ("EOF", "EOF", 8),
+    ]
+    assert lexer.peek() is lexer.tokens[0]
+    assert lexer.next() is lexer.tokens[0]
+    assert lexer.peek() is lexer.tokens[1]
+
+def test_lexer_character_class():
+    alphabet = {"a", "b", "c", "d", "x1", "x2"}
+    lexer = Lexer("a[b-dx1]*x2", alphabet)
+    assert lexer.processed_regex == "a.[b-dx1]*.x2"
+    assert [(token.type, token.value) for token in lexer.tokens] == [
+        ("SYMBOL", "a"),
+        ("OPERATOR", "."),
+        ("CLASS", frozenset({"b", "c", "d", "x1"})),
+        ("OPERATOR", "*"),
+        ("OPERATOR", "."),
+        ("SYMBOL", "x2"),
+        ("EOF", "EOF"),
+    ]
+    assert Lexer("[^ab]", alphabet).tokens[0].value == frozenset({"c", "d", "x1", "x2"})
+    for regex in ["[d-b]", "[^a-x2]", "[ab"]:
+        try:
+            Lexer(regex, alphabet)
+        except LexerError:
+            pass
+        else:
+            assert False
+
+def test_lexer_source_positions():
+    # Positions refer to the source regex, not to the processed one with its inserted operators
+    lexer = Lexer("ab(a)c*", {"a", "b", "c"})
+    assert lexer.processed_regex == "a.b.(a).c*"
+    assert [(token.value, token.position) for token in lexer.tokens] == [
+        ("a", 0), (".", 1), ("b", 1), (".", 2), ("(", 2), ("a", 3), (")", 4), (".", 5), ("c", 5), ("*", 6), ("EOF", 7),
+    ]
+    try:
+        Lexer("ab+bd", {"a", "b"})
+    except LexerError as e:
+        assert e.position == 3
+    else:
+        assert False
@@ -0,0 +1,48 @@
+from scanner import Scanner, ScannerError
+
+def make_scanner():
+    alphabet = {'a', 'b', 'i', 'f', '0', '1', '_'}
+    patterns = [
+        ('IF', 'if'),
+        ('ID', '(a+b+i+f)(a+b+i+f+0+1)*'),
+        ('NUM', '(0+1)(0+1)*'),
+        ('SPACE', '_'),
+    ]
+    return Scanner(patterns, alphabet)
+
+def test_scanner_longest_match_and_priority():
+    scanner = make_scanner()
+    text = 'if_iff_ab01_101_if'
+    tokens = [(name, text[start:end]) for name, start, end in scanner.tokenize(text)]
+    assert tokens == [
+        ('IF', 'if'), ('SPACE', '_'), ('ID', 'iff'), ('SPACE', '_'), ('ID', 'ab01'),
+        ('SPACE', '_'), ('NUM', '101'), ('SPACE', '_'), ('IF', 'if'),
+    ]
+
+def test_scanner_tags():
+    scanner = make_scanner()
+    assert scanner.match('if') == (0, 2)
+    assert scanner.match('ifa') == (1, 3)
+    assert scanner.match('10a') == (2, 2)
+    assert scanner.match('_if', 1) == (0, 3)
+    assert scanner.match('c') is None
+    assert set(scanner.dfa.accept_tags.values()) == {0, 1, 2, 3}
+
+def test_scanner_error():
+    scanner = make_scanner()
+    try:
+        list(scanner.tokenize('ab_2'))
+    except ScannerError as e:
+        assert e.position == 3
+    else:
+        assert False
+
+def test_scanner_unminimized_matches_minimized():
+    alphabet = {'a', 'b'}
+    patterns = [('AB', 'ab'), ('AS', 'a*'), ('ANY', '(a+b)(a+b)*')]
+    minimal = Scanner(patterns, alphabet)
+    full = Scanner(patterns, alphabet, minimize=False)
+    for text in ['ab', 'aaab', 'bbaab', 'abab']:
+        assert list(minimal.tokenize(text)) == list(full.tokenize(text))
+    assert list(minimal.tokenize('aab')) == [('ANY', 0, 3)]
+    assert list(minimal.tokenize('abaa')) == [('ANY', 0, 4)]
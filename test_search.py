@@ -0,0 +1,52 @@
+import io
+import mmap
+
+from compiler import compile
+from search import StreamSearcher, search
+
+def naive_matches(text, compiled):
+    return [
+        (min(start for start in range(end) if compiled.fullmatch(text[start:end])), end)
+        for end in range(1, len(text) + 1)
+        if any(compiled.fullmatch(text[start:end]) for start in range(end))
+    ]
+
+def test_search_matches_naive_search():
+    compiled = compile('ab(a+b)*b+ba', {'a', 'b', 'c'})
+    text = 'cabbabcbaabbbcab'
+    expected = naive_matches(text, compiled)
+
+    assert list(search(compiled.dfa, text, report_starts=True)) == expected
+    assert list(search(compiled.dfa, text)) == [end for _, end in expected]
+
+def test_search_across_chunk_boundaries():
+    compiled = compile('abc', {'a', 'b', 'c'})
+    chunks = (piece for piece in ['xa', 'b', 'cab', 'c', ''])
+    assert list(search(compiled.dfa, chunks, report_starts=True)) == [(1, 4), (4, 7)]
+
+    searcher = StreamSearcher(compiled.dfa)
+    assert searcher.feed('aab') == []
+    assert searcher.feed('cabc') == [4, 7]
+    searcher.reset()
+    assert searcher.feed('c') == []
+
+def test_search_file_and_mmap(tmp_path):
+    compiled = compile('a(b+c)*a', {'a', 'b', 'c'})
+    data = b'xxabcaxxaaxbbab' * 50
+    expected = list(search(compiled.dfa, data.decode('latin-1'), report_starts=True))
+
+    assert list(search(compiled.dfa, io.BytesIO(data), chunk_size=7, report_starts=True)) == expected
+
+    path = tmp_path / 'input.bin'
+    path.write_bytes(data)
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        assert list(search(compiled.dfa, buffer, chunk_size=5, report_starts=True)) == expected
+    with open(path, 'rb') as file:
+        assert list(search(compiled.dfa, file, chunk_size=3)) == [end for _, end in expected]
+
+def test_search_state_cache_is_bounded():
+    compiled = compile('(a+b)*a(a+b)(a+b)(a+b)', {'a', 'b'})
+    searcher = StreamSearcher(compiled.dfa, max_states=4)
+    text = 'abbabaaabbbaabab' * 20
+    assert searcher.feed(text) == list(search(compiled.dfa, text))
+    assert len(searcher.cache) <= 4
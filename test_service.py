@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from lexer import LexerError
+from service import RegexService, serve
+
+
+def test_concurrent_compiles_share_one_future():
+    async def run():
+        service = RegexService()
+        results = await asyncio.gather(*(service.compile('(a+b)*abb', {'a', 'b'}) for _ in range(10)))
+        assert len({id(dfa) for _, dfa in results}) == 1
+        assert service.compiles == 1
+        assert service.coalesced == 9
+        await service.compile('(a+b)*abb', ['b', 'a'])
+        assert service.cache_hits == 1
+        return service.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics['compile_inflight'] == 0
+    assert metrics['cached_automata'] == 1
+    assert metrics['compile_latency']['count'] == 11
+
+
+def test_matches_are_batched():
+    async def run():
+        service = RegexService(batch_window=0.01)
+        _, dfa = await service.compile('(ab)*', {'a', 'b'})
+        words = ['ab' * n + 'a' * (n % 2) for n in range(50)]
+        results = await asyncio.gather(*(service.match(dfa, word) for word in words))
+        assert results == [n % 2 == 0 for n in range(50)]
+        assert service.batches == 1
+        assert service.metrics()['match_latency']['count'] == 50
+        assert service.metrics()['match_queue_depth'] == 0
+
+    asyncio.run(run())
+
+
+def test_compile_errors_reach_every_waiter():
+    async def run():
+        service = RegexService()
+        results = await asyncio.gather(*(service.compile('ax', {'a'}) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, LexerError) for result in results)
+        assert service.compiles == 1
+        assert service.metrics()['cached_automata'] == 0
+
+    asyncio.run(run())
+
+
+def test_unix_socket_protocol(tmp_path):
+    async def run():
+        service = RegexService()
+        server = await serve(service, str(tmp_path / 'regex.sock'))
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(str(tmp_path / 'regex.sock'))
+            requests = [
+                {'id': 1, 'op': 'compile', 'regex': '(a+b)*c', 'alphabet': ['a', 'b', 'c']},
+                {'id': 2, 'op': 'match', 'regex': '(a+b)*c', 'alphabet': ['a', 'b', 'c'], 'inputs': ['abc', 'ab']},
+                {'id': 3, 'op': 'match', 'regex': '(a+b', 'alphabet': ['a', 'b'], 'input': 'a'},
+                {'id': 4, 'op': 'resize'},
+            ]
+            for request in requests:
+                writer.write((json.dumps(request) + '\n').encode('utf-8'))
+            writer.write(b'not json\n')
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in range(5)]
+            writer.close()
+            await writer.wait_closed()
+        return {response['id']: response for response in responses}
+
+    responses = asyncio.run(run())
+    assert responses[1]['result']['states'] > 0
+    assert responses[2]['result'] == [True, False]
+    assert responses[3]['error']['type'] == 'ParserError'
+    assert responses[4]['error']['type'] == 'InputError'
+    assert responses[None]['error']['type'] == 'InputError'
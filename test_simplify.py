@@ -0,0 +1,67 @@
+from dfa import *
+from lexer import *
+from parse import *
+from simplify import Simplifier, simplify_ast
+
+def build(regex, alphabet, simplify):
+    dfa_constructor = DFAConstructor(Lexer(regex, alphabet), simplify=simplify)
+    return dfa_constructor, dfa_constructor.construct_dfa(dfa_constructor.ast)
+
+
+def test_simplification_keeps_language():
+    alphabet = {'a', 'b', 'c', 'd'}
+    for regex in ['a**', 'a+a', '(a+$)*', 'ab+ac', 'a$b', '(a*+b)*', 'a*a*', 'abc+abd+ab',
+                  '(a+b){1,4}', '((a+b)*+c)*', '(ab+ab)*c+abc', '(a+b)(c+d)+(a+b)c', '$+a*',
+                  '([a-c]d+[a-c]a)*', '(a{2,3}+a{2})b']:
+        plain_constructor, plain = build(regex, alphabet, False)
+        simple_constructor, simple = build(regex, alphabet, True)
+        assert simple.equivalent(plain) == (True, None), regex
+        assert len(simple_constructor.followpos_table) == len(plain_constructor.followpos_table) - simple_constructor.positions_removed
+
+
+def test_simplification_removes_positions():
+    alphabet = {'a', 'b', 'c', 'd'}
+    assert build('a+a', alphabet, True)[0].positions_removed == 1
+    assert build('a*a*', alphabet, True)[0].positions_removed == 1
+    assert build('abc+abd+ab', alphabet, True)[0].positions_removed == 4
+    assert build('(ab+ab)*c+abc', alphabet, True)[0].positions_removed == 2
+    assert build('(a+b)c', alphabet, True)[0].positions_removed == 0
+
+
+def test_simplified_tree_shape():
+    parser = Parser(Lexer('(a**+$)*b$', {'a', 'b'}))
+    ast, removed = simplify_ast(parser.parse())
+    assert removed == 0
+    assert parser.format_ast(ast) == '\n'.join([
+        "CONCAT(pos=None)",
+        "  CONCAT(pos=None)",
+        "    STAR(pos=None)",
+        "      SYMBOL('a', pos=None)",
+        "    SYMBOL('b', pos=None)",
+        "  SYMBOL('#', pos=None)",
+    ])
+
+
+def test_prefix_factoring_scales_linearly(monkeypatch):
+    # Each alternative shares a longer prefix with the next one, so factoring goes one level deeper per
+    # alternative. Count the factors flattened and rebuilt: the work must stay linear in the regex length.
+    work = []
+    factors, make_concat = Simplifier.factors, Simplifier.make_concat
+    monkeypatch.setattr(Simplifier, 'factors', lambda self, node: work.append(len(result := factors(self, node))) or result)
+    monkeypatch.setattr(Simplifier, 'make_concat', lambda self, parts: work.append(len(parts)) or make_concat(self, parts))
+    for n in [20, 80]:
+        work.clear()
+        regex = '+'.join('a' * i + 'b' for i in range(1, n))
+        ast, removed = simplify_ast(Parser(Lexer(regex, {'a', 'b'})).parse())
+        assert removed == (n - 1) * (n - 2) // 2
+        assert sum(work) <= 6 * len(regex)
+
+
+def test_nested_star_with_shared_prefixes_terminates():
+    # The inner star's factored union ends up next to an alternative with the same factors
+    regex = '((ab+abc*d*)*+abc*d*)*'
+    alphabet = {'a', 'b', 'c', 'd'}
+    simple_constructor, simple = build(regex, alphabet, True)
+    _, plain = build(regex, alphabet, False)
+    assert simple_constructor.positions_removed == 6
+    assert simple.equivalent(plain) == (True, None)
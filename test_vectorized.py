@@ -0,0 +1,35 @@
+import itertools
+
+import pytest
+
+from compiler import compile
+
+np = pytest.importorskip("numpy")
+
+from vectorized import VectorMatcher, fullmatch_many
+
+
+def test_vectorized_matches_dfa():
+    alphabet = {'a', 'b', 'c'}
+    for regex in ['(a+b)*abb', '(ab+c)*', '[^c]*c(a+b){2,3}', '$', 'a{2,}']:
+        dfa = compile(regex, alphabet).dfa
+        words = [''.join(w) for n in range(7) for w in itertools.product('abc', repeat=n)]
+        words += ['ax', 'x', 'abbé']
+        assert list(fullmatch_many(dfa, words)) == [dfa.fullmatch(w) for w in words]
+
+
+def test_vectorized_multichar_symbols():
+    dfa = compile('(x1+x2)*x3', {'x1', 'x2', 'x3'}).dfa
+    matcher = VectorMatcher(dfa)
+    words = [['x3'], ['x1', 'x2', 'x3'], ['x3', 'x3'], ['x4', 'x3'], []]
+    assert matcher.fullmatch_many(words).tolist() == [True, True, False, False, False]
+
+
+def test_vectorized_encode_pads_rows():
+    dfa = compile('(a+b)*', {'a', 'b'}).dfa
+    matcher = VectorMatcher(dfa)
+    matrix, lengths = matcher.encode(['ab', '', 'b'])
+    assert matrix.shape == (3, 2)
+    assert lengths.tolist() == [2, 0, 1]
+    assert matrix[1].tolist() == [matcher.pad, matcher.pad]
+    assert matcher.fullmatch_many([]).shape == (0,)
@@ -0,0 +1,114 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only this module needs it
+    np = None
+
+
+class VectorMatcher:
+    def __init__(self, dfa):
+        # Match many sequences against one DFA at once with NumPy. Every state is a row of an integer
+        # transition table with one column per symbol class plus two extra columns: PAD keeps the state
+        # unchanged (used to pad shorter sequences) and UNKNOWN leads to a rejecting sink (symbols
+        # outside the alphabet). Rows follow CompiledDFA's numbering, so the start state is row 0.
+        if np is None:
+            raise ImportError("VectorMatcher requires NumPy")
+        compiled = dfa.compile()
+        width = compiled.width
+        states = compiled.num_states
+        self.symbol_index = compiled.symbol_index
+        self.pad = width
+        self.unknown = width + 1
+        self.sink = states
+
+        table = np.empty((states + 1, width + 2), dtype=np.int32)
+        table[:states, :width] = np.frombuffer(compiled.table, dtype=compiled.table.typecode).reshape(states, width) // width
+        table[:, self.pad] = np.arange(states + 1)
+        table[:, self.unknown] = self.sink
+        table[self.sink, :width] = self.sink
+        self.table = table
+
+        self.accept = np.zeros(states + 1, dtype=bool)
+        for state in range(states):
+            self.accept[state] = compiled.is_accepting(state)
+        # States from which nothing can be accepted any more; a batch stops once every row is in one
+        self.rejecting = np.zeros(states + 1, dtype=bool)
+        self.rejecting[self.sink] = True
+        if compiled.dead >= 0:
+            self.rejecting[compiled.dead // width] = True
+
+        # Code point lookup used to encode str inputs when every symbol is a single character
+        single = [symbol for symbol in self.symbol_index if len(symbol) == 1]
+        self.char_codes = None
+        if single and len(single) == len(self.symbol_index) and max(map(ord, single)) < 1 << 16:
+            self.char_codes = np.full(max(map(ord, single)) + 2, self.unknown, dtype=np.int32)
+            for symbol in single:
+                self.char_codes[ord(symbol)] = self.symbol_index[symbol]
+
+
+    def flat_codes(self, seqs):
+        # Return the symbol codes of all sequences concatenated, and the length of each sequence
+        lengths = np.fromiter((len(seq) for seq in seqs), dtype=np.int64, count=len(seqs))
+        if self.char_codes is not None and all(isinstance(seq, str) for seq in seqs):
+            # Vectorized path: decode the joined text into code points and map them through the lookup
+            points = np.frombuffer(''.join(seqs).encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+            codes = self.char_codes[np.minimum(points, len(self.char_codes) - 1)]
+        else:
+            index = self.symbol_index
+            unknown = self.unknown
+            codes = np.fromiter((index.get(symbol, unknown) for seq in seqs for symbol in seq),
+                                dtype=np.int32, count=int(lengths.sum()))
+        return codes, lengths
+
+
+    def encode(self, seqs, width=None):
+        # Encode sequences as a padded 2-D array of symbol codes (one row per sequence, padded with PAD
+        # up to width columns, by default the longest length) and return it with the length vector
+        codes, lengths = self.flat_codes(seqs)
+        if width is None:
+            width = int(lengths.max()) if len(lengths) else 0
+        matrix = np.full((len(seqs), width), self.pad, dtype=np.int32)
+        rows = np.repeat(np.arange(len(seqs)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        columns = np.arange(len(codes)) - np.repeat(starts, lengths)
+        matrix[rows, columns] = codes
+        return matrix, lengths
+
+
+    def run(self, matrix, check_every=16):
+        # Advance every row's state one column at a time by fancy-indexing the transition table and
+        # return the boolean accept vector. Stops early once every row is in a rejecting state.
+        states = np.zeros(matrix.shape[0], dtype=np.int32)
+        table = self.table
+        columns = np.ascontiguousarray(matrix.T)  # Each step reads one column, so store columns contiguously
+        for step, column in enumerate(columns, 1):
+            states = table[states, column]
+            if step % check_every == 0 and self.rejecting[states].all():
+                break
+        return self.accept[states]
+
+
+    def fullmatch_many(self, seqs, bucket_ratio=2):
+        # Return a boolean vector telling which sequences the DFA accepts, in input order.
+        # Sequences are sorted by length and cut into buckets whose longest member is at most
+        # bucket_ratio times its shortest, which bounds the padding in each bucket.
+        seqs = list(seqs)
+        result = np.zeros(len(seqs), dtype=bool)
+        if not seqs:
+            return result
+        lengths = np.fromiter((len(seq) for seq in seqs), dtype=np.int64, count=len(seqs))
+        order = np.argsort(lengths, kind='stable')
+        start = 0
+        while start < len(order):
+            shortest = max(int(lengths[order[start]]), 1)
+            end = int(np.searchsorted(lengths[order], shortest * bucket_ratio, side='right'))
+            end = max(end, start + 1)
+            bucket = order[start:end]
+            matrix, _ = self.encode([seqs[i] for i in bucket], int(lengths[order[end - 1]]))
+            result[bucket] = self.run(matrix)
+            start = end
+        return result
+
+
+def fullmatch_many(dfa, seqs):
+    # Vectorized DFA.fullmatch over many sequences; returns a NumPy boolean vector in input order
+    return VectorMatcher(dfa).fullmatch_many(seqs)